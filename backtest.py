@@ -0,0 +1,347 @@
+import argparse
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarSeries, bars_frame
+from signals import PHASE_STRATEGY, SignalEngine, SignalStrategy, load_strategies, series_signals
+from strategy import StrategyParams, compute_indicators
+
+logger = logging.getLogger(__name__)
+
+EXIT_TP = 'tp'
+EXIT_SL = 'sl'
+EXIT_TREND = 'trend-change'
+EXIT_PHASE = 'phase-end'
+EXIT_EOD = 'end-of-data'
+
+
+@dataclass
+class BacktestConfig:
+    max_trades_per_phase: int = 3
+    profit_target_per_phase: float = 6.2
+    max_phases: Optional[int] = None  # None keeps opening new phases until the data ends
+    spread: Optional[float] = None  # price units; None uses the file's spread column in points
+    point: float = 0.01
+    deviation: int = 5  # points, as sent with every live order
+    slippage: float = 0.0  # adverse fill slippage in points; fills beyond deviation are rejected
+    contract_size: float = 100.0
+    initial_balance: float = 1000.0
+
+
+@dataclass
+class BacktestResult:
+    equity: pd.DataFrame
+    trades: pd.DataFrame
+    phases: pd.DataFrame
+    config: BacktestConfig
+    params: StrategyParams
+    elapsed: float = 0.0
+    stats: dict = field(default_factory=dict)
+
+
+def load_bars(path: str) -> pd.DataFrame:
+    if path.endswith('.bars'):
+        return bars_frame(BarSeries(path).bars())  # memory-mapped store, already sorted
+    if path.endswith(('.parquet', '.pq')):
+        bars = pd.read_parquet(path)
+    else:
+        bars = pd.read_csv(path)
+    bars.columns = [column.strip().lower() for column in bars.columns]
+    missing = {'time', 'open', 'high', 'low', 'close'} - set(bars.columns)
+    if missing:
+        raise ValueError(f"Missing columns in {path}: {', '.join(sorted(missing))}")
+    if not pd.api.types.is_numeric_dtype(bars['time']):
+        bars['time'] = (pd.to_datetime(bars['time']) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return bars.sort_values('time').reset_index(drop=True)
+
+
+# Fills market orders against bar data the way the terminal would against
+# ticks: buys at ask (bid + spread), sells at bid, with optional adverse
+# slippage that is rejected once it exceeds the order's deviation.
+class SimulatedBroker:
+    def __init__(self, bars: pd.DataFrame, config: BacktestConfig):
+        self.config = config
+        self.open = bars['open'].to_numpy(np.float64)
+        self.high = bars['high'].to_numpy(np.float64)
+        self.low = bars['low'].to_numpy(np.float64)
+        self.close = bars['close'].to_numpy(np.float64)
+        if config.spread is not None:
+            self.spread = np.full(len(bars), float(config.spread))
+        elif 'spread' in bars.columns:
+            self.spread = bars['spread'].to_numpy(np.float64) * config.point
+        else:
+            self.spread = np.zeros(len(bars))
+        self.slippage = config.slippage * config.point
+        self.accepts_orders = config.slippage <= config.deviation
+
+    def entry_price(self, direction: int, bar: int) -> float:
+        bid = self.open[bar]
+        price = bid + self.spread[bar] if direction > 0 else bid
+        return price + direction * self.slippage
+
+    def exit_price(self, direction: int, bar: int, bid: float) -> float:
+        price = bid if direction > 0 else bid + self.spread[bar]
+        return price - direction * self.slippage
+
+    def first_hit(self, start: int, direction: int, tp: float, sl: float):
+        # Scans forward in growing vectorized chunks for the first bar whose
+        # range touches TP or SL. When both are inside one bar, SL wins.
+        n = len(self.close)
+        pos, chunk = start, 64
+        while pos < n:
+            end = min(n, pos + chunk)
+            if direction > 0:
+                sl_hit = self.low[pos:end] <= sl
+                tp_hit = self.high[pos:end] >= tp
+            else:
+                spread = self.spread[pos:end]
+                sl_hit = self.high[pos:end] + spread >= sl
+                tp_hit = self.low[pos:end] + spread <= tp
+            hit = sl_hit | tp_hit
+            if hit.any():
+                offset = int(np.argmax(hit))
+                bar = pos + offset
+                opening = self.open[bar] + (0 if direction > 0 else self.spread[bar])
+                if sl_hit[offset]:
+                    gapped = opening < sl if direction > 0 else opening > sl
+                    return bar, (opening if gapped else sl), EXIT_SL
+                gapped = opening > tp if direction > 0 else opening < tp
+                return bar, (opening if gapped else tp), EXIT_TP
+            pos, chunk = end, chunk * 4
+        return n, np.nan, None
+
+
+def run_backtest(bars: pd.DataFrame, params: Optional[StrategyParams] = None,
+                 config: Optional[BacktestConfig] = None, indicators: Optional[dict] = None,
+                 strategy: Optional[SignalStrategy] = None) -> BacktestResult:
+    # Trades the live rule (the phase strategy unless one is given); params
+    # override the strategy's own
+    strategy = strategy or PHASE_STRATEGY
+    params = params or strategy.params
+    config = config or BacktestConfig()
+    started = time.perf_counter()
+
+    broker = SimulatedBroker(bars, config)
+    times = bars['time'].to_numpy(np.int64)
+    close = broker.close
+    if indicators is None:
+        indicators = compute_indicators(broker.high, broker.low, close, params)
+    columns = {'open': broker.open, 'high': broker.high, 'low': broker.low, 'close': close, **indicators}
+    columns.update({name: bars[name].to_numpy(np.float64) for name in ('tick_volume', 'spread') if name in bars.columns})
+    direction, strong = series_signals(replace(strategy, params=params), columns)
+    atr = indicators['atr']
+    n = len(close)
+    contract = config.contract_size
+    if n == 0:
+        return _build_result(times, np.empty(0), np.empty(0), [], [], config, params, -1,
+                             time.perf_counter() - started)
+
+    balance = config.initial_balance
+    equity = np.full(n, np.nan)
+    balances = np.full(n, np.nan)
+    positions = []
+    trades = []
+    phases = []
+    phase = 1
+    phase_trades = 0  # mirrors len(active_trades): orders sent this phase
+    phase_start = 0
+    current_trend = 0
+    stopped = False
+
+    def close_position(position, bar, price, reason):
+        nonlocal balance
+        pnl = position['direction'] * (price - position['entry']) * position['volume'] * contract
+        balance += pnl
+        position.update(exit_bar=bar, exit=price, pnl=pnl, reason=reason)
+        trades.append(position)
+
+    def close_all(bar, reason):
+        for position in positions:
+            close_position(position, bar, broker.exit_price(position['direction'], bar, close[bar]), reason)
+        positions.clear()
+
+    def finish_phase(bar, completed, reason):
+        phases.append({
+            'phase': phase,
+            'start_bar': phase_start,
+            'end_bar': bar,
+            'completed': completed,
+            'reason': reason,
+        })
+
+    for i in range(n):
+        # Intrabar TP/SL exits (precomputed when each position was opened)
+        if positions:
+            for position in [p for p in positions if p['hit_bar'] == i]:
+                positions.remove(position)
+                close_position(position, i, position['hit_price'], position['hit_reason'])
+
+        # monitor_phase: phase profit is the floating P&L of open positions
+        floating = 0.0
+        for position in positions:
+            mark = broker.exit_price(position['direction'], i, close[i])
+            floating += position['direction'] * (mark - position['entry']) * position['volume'] * contract
+        balances[i] = balance
+        equity[i] = balance + floating
+
+        if positions and floating >= config.profit_target_per_phase:
+            close_all(i, EXIT_PHASE)
+            equity[i] = balances[i] = balance
+            finish_phase(i, True, 'target')
+            if config.max_phases is not None and phase >= config.max_phases:
+                stopped = True
+                break
+            phase += 1
+            phase_trades = 0
+            phase_start = i + 1
+            continue
+
+        if i == n - 1:
+            break
+
+        # check_conditions on the closed bar, orders fill at the next open
+        trend = int(direction[i])
+        if trend and trend != current_trend:
+            current_trend = trend
+            if phase_trades:
+                close_all(i, EXIT_TREND)
+                phase_trades = 0
+
+        if trend and phase_trades < config.max_trades_per_phase and broker.accepts_orders:
+            entry_bar = i + 1
+            entry = broker.entry_price(trend, entry_bar)
+            volume = params.strong_lot if strong[i] else params.base_lot
+            tp = entry + trend * params.tp_atr * atr[i]
+            sl = entry - trend * params.sl_atr * atr[i]
+            hit_bar, hit_price, hit_reason = broker.first_hit(entry_bar, trend, tp, sl)
+            positions.append({
+                'phase': phase,
+                'direction': trend,
+                'strength': 'extreme' if strong[i] else 'normal',
+                'volume': volume,
+                'entry_bar': entry_bar,
+                'entry': entry,
+                'tp': tp,
+                'sl': sl,
+                'hit_bar': hit_bar,
+                'hit_price': hit_price,
+                'hit_reason': hit_reason,
+            })
+            phase_trades += 1
+
+    last = min(i, n - 1)
+    if positions:
+        close_all(last, EXIT_EOD)
+        equity[last] = balances[last] = balance
+    if not stopped:
+        finish_phase(last, False, EXIT_EOD)
+
+    return _build_result(times, balances, equity, trades, phases, config, params, last,
+                         time.perf_counter() - started)
+
+
+def _build_result(times, balances, equity, trades, phases, config, params, last, elapsed) -> BacktestResult:
+    stamps = pd.to_datetime(times, unit='s')
+    equity_df = pd.DataFrame({
+        'time': stamps[:last + 1],
+        'balance': balances[:last + 1],
+        'equity': equity[:last + 1],
+    })
+    trade_columns = ['phase', 'direction', 'strength', 'volume', 'entry_time', 'entry', 'tp', 'sl',
+                     'exit_time', 'exit', 'pnl', 'reason']
+    trades_df = pd.DataFrame(trades)
+    if trades_df.empty:
+        trades_df = pd.DataFrame(columns=trade_columns)
+    else:
+        trades_df['entry_time'] = stamps[trades_df['entry_bar'].to_numpy()]
+        trades_df['exit_time'] = stamps[trades_df['exit_bar'].to_numpy()]
+        trades_df['direction'] = np.where(trades_df['direction'] > 0, 'bullish', 'bearish')
+        trades_df = trades_df.sort_values('entry_time', kind='stable')[trade_columns].reset_index(drop=True)
+
+    phases_df = pd.DataFrame(phases)
+    if not phases_df.empty:
+        phases_df['start'] = stamps[phases_df['start_bar'].clip(upper=last).to_numpy()]
+        phases_df['end'] = stamps[phases_df['end_bar'].to_numpy()]
+        by_phase = trades_df.groupby('phase')['pnl']
+        phases_df['trades'] = phases_df['phase'].map(by_phase.size()).fillna(0).astype(int)
+        phases_df['profit'] = phases_df['phase'].map(by_phase.sum()).fillna(0.0)
+        phases_df['wins'] = phases_df['phase'].map(by_phase.apply(lambda pnl: int((pnl > 0).sum()))).fillna(0).astype(int)
+        phases_df = phases_df[['phase', 'start', 'end', 'trades', 'wins', 'profit', 'completed', 'reason']]
+
+    result = BacktestResult(equity_df, trades_df, phases_df, config, params, elapsed)
+    result.stats = summarize(result)
+    return result
+
+
+def summarize(result: BacktestResult) -> dict:
+    pnl = result.trades['pnl'].astype(float) if not result.trades.empty else pd.Series(dtype=float)
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+    equity = result.equity['equity'].to_numpy()
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = (peak - equity) if len(equity) else equity
+    return {
+        'net_profit': float(pnl.sum()),
+        'trades': int(len(pnl)),
+        'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+        'profit_factor': float(gross_profit / gross_loss) if gross_loss else float('inf') if gross_profit else 0.0,
+        'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+        'max_drawdown_pct': float((drawdown / peak).max()) if len(drawdown) else 0.0,
+        'phases_completed': int(result.phases['completed'].sum()) if not result.phases.empty else 0,
+        'final_equity': float(equity[-1]) if len(equity) else result.config.initial_balance,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Replay historical bars through the phase strategy")
+    parser.add_argument("bars", help="OHLC file (.csv, .parquet or a bar store .bars file) with time, open, high, low, close[, spread]")
+    parser.add_argument("--max-trades", type=int, default=3)
+    parser.add_argument("--profit-target", type=float, default=6.2)
+    parser.add_argument("--max-phases", type=int, default=None)
+    parser.add_argument("--spread", type=float, default=None, help="Fixed spread in price units")
+    parser.add_argument("--point", type=float, default=0.01)
+    parser.add_argument("--deviation", type=int, default=5)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    parser.add_argument("--contract-size", type=float, default=100.0)
+    parser.add_argument("--balance", type=float, default=1000.0)
+    parser.add_argument("--strategies", default=os.getenv("TRADER_STRATEGIES"),
+                        help="Strategy file as used live (default: TRADER_STRATEGIES); its live strategy is replayed")
+    parser.add_argument("--out-dir", default=None, help="Write equity.csv, trades.csv and phases.csv here")
+    args = parser.parse_args()
+
+    config = BacktestConfig(
+        max_trades_per_phase=args.max_trades,
+        profit_target_per_phase=args.profit_target,
+        max_phases=args.max_phases,
+        spread=args.spread,
+        point=args.point,
+        deviation=args.deviation,
+        slippage=args.slippage,
+        contract_size=args.contract_size,
+        initial_balance=args.balance,
+    )
+    bars = load_bars(args.bars)
+    strategy = SignalEngine(load_strategies(args.strategies)).live
+    result = run_backtest(bars, config=config, strategy=strategy)
+    logger.info(f"Backtest over {len(bars)} bars finished in {result.elapsed:.2f}s")
+    for key, value in result.stats.items():
+        logger.info(f"• {key}: {value:.4f}" if isinstance(value, float) else f"• {key}: {value}")
+    if not result.phases.empty:
+        logger.info("\n" + result.phases.to_string(index=False))
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        result.equity.to_csv(os.path.join(args.out_dir, "equity.csv"), index=False)
+        result.trades.to_csv(os.path.join(args.out_dir, "trades.csv"), index=False)
+        result.phases.to_csv(os.path.join(args.out_dir, "phases.csv"), index=False)
+        pd.Series({**asdict(config), **result.stats}).to_json(os.path.join(args.out_dir, "summary.json"), indent=2)
+
+
+if __name__ == "__main__":
+    main()
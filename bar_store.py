@@ -0,0 +1,229 @@
+import argparse
+import bisect
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from market_data import RATE_FIELDS, RATES_DTYPE
+
+logger = logging.getLogger(__name__)
+
+
+# One append-only file of closed bars per symbol and timeframe, stored as raw
+# RATES_DTYPE records so it can be memory-mapped as-is. Reads return views of
+# the mapping (no copy); a torn record left by a crash mid-append is dropped
+# the next time the file is opened.
+class BarSeries:
+    def __init__(self, path: str):
+        self.path = path
+        self._map = None
+        self._repair()
+
+    def _repair(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        torn = size % RATES_DTYPE.itemsize
+        if torn:
+            logger.warning(f"Dropping {torn} trailing bytes from {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(size - torn)
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // RATES_DTYPE.itemsize
+
+    def bars(self) -> np.ndarray:
+        count = len(self)
+        if count == 0:
+            return np.empty(0, dtype=RATES_DTYPE)
+        if self._map is None or len(self._map) != count:
+            self._map = np.memmap(self.path, dtype=RATES_DTYPE, mode='r', shape=(count,))
+        return self._map
+
+    def last_time(self) -> Optional[int]:
+        bars = self.bars()
+        return int(bars['time'][-1]) if len(bars) else None
+
+    def slice(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        # Bars with start <= time < end (epoch seconds), as a view of the map
+        bars = self.bars()
+        times = bars['time']  # strided view; bisect avoids the copy np.searchsorted would make
+        first = 0 if start is None else bisect.bisect_left(times, start)
+        last = len(bars) if end is None else bisect.bisect_left(times, end)
+        return bars[first:last]
+
+    def tail(self, count: int) -> np.ndarray:
+        bars = self.bars()
+        return bars[max(0, len(bars) - count):]
+
+    def append(self, rates, contiguous=False) -> int:
+        # Takes closed bars only; bars at or before the newest stored bar are
+        # skipped, and history older than the file is merged in by a rewrite.
+        # Bars must share at least one bar with the stored range so no hole
+        # can open up, unless the caller knows they follow on (contiguous).
+        if rates is None or len(rates) == 0:
+            return 0
+        rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+        _, unique = np.unique(rates['time'], return_index=True)
+        rates = rates[unique]
+        last = self.last_time()
+        if last is not None and not contiguous:
+            first = int(self.bars()['time'][0])
+            if rates['time'][0] > last or rates['time'][-1] < first:
+                logger.warning(f"{self.path}: bars {int(rates['time'][0])}..{int(rates['time'][-1])} "
+                               f"do not overlap the stored {first}..{last}; not stored")
+                return 0
+        if last is not None and rates['time'][0] < self.bars()['time'][0]:
+            return self._merge(rates)
+        if last is not None:
+            rates = rates[rates['time'] > last]
+        if len(rates) == 0:
+            return 0
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(rates.tobytes())
+        return len(rates)
+
+    def _release(self):
+        # Windows will not replace a file that is still mapped, so close our
+        # mapping rather than waiting for it to be garbage collected
+        mapping, self._map = self._map, None
+        if mapping is not None and getattr(mapping, '_mmap', None) is not None:
+            try:
+                mapping._mmap.close()
+            except BufferError:
+                pass  # a caller still holds a view; it unmaps when that view goes
+
+    def _merge(self, rates: np.ndarray) -> int:
+        stored = np.array(self.bars())
+        merged = np.concatenate((rates, stored))
+        _, unique = np.unique(merged['time'], return_index=True)
+        merged = merged[unique]
+        self._release()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(merged.tobytes())
+        try:
+            os.replace(tmp, self.path)
+        except PermissionError:
+            os.remove(tmp)
+            logger.warning(f"{self.path} is still mapped elsewhere; older bars not merged")
+            return 0
+        return len(merged) - len(stored)
+
+
+class BarStore:
+    def __init__(self, root="bars"):
+        self.root = root
+        self.series_by_key: Dict[tuple, BarSeries] = {}
+
+    def series(self, symbol: str, timeframe: str) -> BarSeries:
+        key = (symbol, timeframe)
+        series = self.series_by_key.get(key)
+        if series is None:
+            series = self.series_by_key[key] = BarSeries(os.path.join(self.root, symbol, f"{timeframe}.bars"))
+        return series
+
+
+def bars_frame(bars: np.ndarray) -> pd.DataFrame:
+    # Column views over the record array; backtest/optimizer input
+    return pd.DataFrame({field: bars[field] for field in RATE_FIELDS}, copy=False)
+
+
+def backfill(broker, store: BarStore, symbol: str, timeframe: str, date_from: datetime,
+             date_to: Optional[datetime] = None, chunk_days=30) -> int:
+    # Pulls copy_rates_range in chunks. With an open-ended range the newest
+    # bar may still be forming, so it is left for the live loop to store.
+    series = store.series(symbol, timeframe)
+    tf = getattr(broker, f"TIMEFRAME_{timeframe}")
+    start = int(date_from.replace(tzinfo=timezone.utc).timestamp())
+    end = int((date_to or datetime.now(timezone.utc)).replace(tzinfo=timezone.utc).timestamp())
+    if date_to is None:
+        end += 86400  # server clocks run ahead of UTC
+    # Fetch so the range always shares a bar with what is stored: resume from
+    # the newest stored bar, or reach forward to the oldest one
+    stored = series.last_time()
+    if stored is not None:
+        first = int(series.bars()['time'][0])
+        if start >= first:
+            start = stored
+        else:
+            end = max(end, first + 1)
+    total = 0
+    step = chunk_days * 86400
+    chunks = []
+    for chunk_start in range(start, end, step):
+        rates = broker.copy_rates_range(symbol, tf, chunk_start, min(end, chunk_start + step) - 1)
+        if rates is not None and len(rates):
+            chunks.append(rates)
+    if chunks:
+        rates = np.concatenate([chunk.astype(RATES_DTYPE, copy=False) for chunk in chunks])
+        total = series.append(rates[:-1] if date_to is None else rates)
+    return total
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Local memory-mapped bar store")
+    parser.add_argument("--root", default=os.getenv("TRADER_BAR_STORE", "bars"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    fill = commands.add_parser("backfill", help="Fill the store from copy_rates_range")
+    fill.add_argument("symbol")
+    fill.add_argument("timeframe", help="M1, M5, M15, ...")
+    fill.add_argument("--from", dest="date_from", required=True, help="YYYY-MM-DD")
+    fill.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (default: now)")
+    fill.add_argument("--chunk-days", type=int, default=30)
+    info = commands.add_parser("info", help="Show stored ranges")
+    info.add_argument("symbol")
+    info.add_argument("timeframe")
+    export = commands.add_parser("export", help="Write a stored range to CSV/Parquet")
+    export.add_argument("symbol")
+    export.add_argument("timeframe")
+    export.add_argument("out")
+    args = parser.parse_args()
+
+    store = BarStore(args.root)
+    if args.command == "backfill":
+        from broker import load_broker
+
+        broker = load_broker()
+        if not broker.initialize():
+            raise SystemExit(f"initialize() failed: {broker.last_error()}")
+        if os.getenv("MT5_LOGIN"):
+            broker.login(login=int(os.getenv("MT5_LOGIN")), password=os.getenv("MT5_PASSWORD"),
+                         server=os.getenv("MT5_SERVER", "Deriv-Demo"))
+        broker.symbol_select(args.symbol, True)
+        started = time.perf_counter()
+        added = backfill(
+            broker, store, args.symbol, args.timeframe.upper(), datetime.fromisoformat(args.date_from),
+            datetime.fromisoformat(args.date_to) if args.date_to else None, args.chunk_days,
+        )
+        broker.shutdown()
+        logger.info(f"Stored {added} new bars in {time.perf_counter() - started:.1f}s")
+
+    series = store.series(args.symbol, args.timeframe.upper())
+    started = time.perf_counter()
+    bars = series.bars()
+    elapsed = (time.perf_counter() - started) * 1000
+    if args.command == "export":
+        frame = bars_frame(bars)
+        if args.out.endswith(('.parquet', '.pq')):
+            frame.to_parquet(args.out, index=False)
+        else:
+            frame.to_csv(args.out, index=False)
+    if len(bars):
+        first, last = (pd.to_datetime(int(t), unit='s') for t in (bars['time'][0], bars['time'][-1]))
+        logger.info(f"{series.path}: {len(bars)} bars {first} .. {last} (mapped in {elapsed:.2f} ms)")
+    else:
+        logger.info(f"{series.path}: empty")
+
+
+if __name__ == "__main__":
+    main()
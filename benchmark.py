@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from notifications import NotificationDispatcher, Sink
+
+logger = logging.getLogger(__name__)
+
+BAR_COUNTS = (100, 1000, 100000)
+POSITION_COUNTS = (1, 10, 100, 500)
+
+
+class SlowSink(Sink):
+    # Stand-in for a rate-limited chat API
+    name = "slow"
+    retry_delay = 0
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.sent = 0
+
+    async def send(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.sent += 1
+
+
+def _summary(samples, ops=1) -> dict:
+    samples = sorted(sample / ops for sample in samples)
+    return {
+        'median_s': statistics.median(samples),
+        'p95_s': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min_s': samples[0],
+        'runs': len(samples),
+        'ops_per_run': ops,
+    }
+
+
+def measure(fn: Callable, repeat: int, ops=1, setup: Optional[Callable] = None) -> dict:
+    # One untimed warm-up run, then `repeat` timed runs
+    samples = []
+    for run in range(repeat + 1):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        if run:
+            samples.append(time.perf_counter() - started)
+    return _summary(samples, ops)
+
+
+async def ameasure(fn: Callable, repeat: int, ops=1, setup: Optional[Callable] = None) -> dict:
+    samples = []
+    for run in range(repeat + 1):
+        if setup:
+            result = setup()
+            if asyncio.iscoroutine(result):
+                await result
+        started = time.perf_counter()
+        await fn()
+        if run:
+            samples.append(time.perf_counter() - started)
+    return _summary(samples, ops)
+
+
+# Every benchmark runs against a SimulatedMT5 whose clock is frozen
+# (ticks_per_second=0), so prices, bars and fills are identical run to run
+# and no terminal or network is involved.
+class Suite:
+    def __init__(self, quick=False, only: Optional[str] = None):
+        self.quick = quick
+        self.only = only
+        self.results: Dict[str, dict] = {}
+
+    def wanted(self, name: str) -> bool:
+        return self.only is None or self.only in name
+
+    def repeat(self, full: int) -> int:
+        return max(3, full // 5) if self.quick else full
+
+    def record(self, name: str, result: dict):
+        self.results[name] = result
+        logger.info(f"{name:<40} median {result['median_s'] * 1e6:12.1f} us  p95 {result['p95_s'] * 1e6:12.1f} us")
+
+    async def run(self):
+        self.tmp = tempfile.mkdtemp(prefix="trader-bench-")
+        os.environ["TRADER_BROKER"] = "sim"
+        os.environ["TRADER_JOURNAL"] = ":memory:"
+        os.environ["TRADER_BAR_STORE"] = self.tmp
+        for name in ("TRADER_ACCOUNTS", "TRADER_STRATEGIES", "TRADER_MAX_EXPOSURE_LOTS"):
+            os.environ.pop(name, None)
+
+        import bot
+        from mt5_executor import MT5Executor
+        from simulator import SimulatedMT5
+
+        self.bot = bot
+        self.sim = SimulatedMT5(ticks_per_second=0, balance=1e9, history=max(BAR_COUNTS), seed=7)
+        bot.mt5 = self.sim
+        bot.mt5_executor = MT5Executor(self.sim)
+        self.engine = bot.TradingEngine(instances=(("XAUUSD", "M15"),))
+        if not await self.engine.connect_mt5():
+            raise RuntimeError("Simulator connection failed")
+        await self.engine.handle_config("1000000", "1e12", "1000")
+        self.trader = self.engine.traders[0]
+        self.rates = self.sim.copy_rates_from_pos("XAUUSD", self.sim.TIMEFRAME_M15, 0, max(BAR_COUNTS))
+
+        try:
+            self.bench_market_data()
+            await self.bench_get_market_data()
+            await self.bench_check_conditions()
+            await self.bench_execute_trade()
+            await self.bench_close_all_trades()
+            await self.bench_send_message()
+        finally:
+            await self.engine.notifier.close()
+            await self.engine.journal.close()
+            bot.mt5_executor.stop()
+        return self.results
+
+    def bench_market_data(self):
+        from market_data import BarCache
+        from strategy import StrategyParams, compute_indicators
+
+        params = StrategyParams()
+        for count in BAR_COUNTS:
+            rates = self.rates[-count:]
+            repeat = self.repeat(50 if count < 100000 else 5)
+            cache = BarCache("XAUUSD", self.sim.TIMEFRAME_M15, 900, history=count, params=params)
+
+            if self.wanted(f"market_data.cold[{count}]"):
+                def cold():
+                    cache.apply(rates)
+                    cache.frame()
+                self.record(f"market_data.cold[{count}]", measure(cold, repeat, setup=cache.reset))
+
+            if self.wanted(f"market_data.refresh[{count}]"):
+                # Steady state: the forming bar moved, re-apply the last two bars
+                cache.reset()
+                cache.apply(rates)
+                tail = rates[-2:].copy()
+
+                def refresh():
+                    tail['close'][-1] += 0.01
+                    cache.apply(tail)
+                    cache.frame()
+                self.record(f"market_data.refresh[{count}]", measure(refresh, self.repeat(200)))
+
+            if self.wanted(f"indicators.vectorized[{count}]"):
+                high, low, close = (np.asarray(rates[field], dtype=np.float64) for field in ('high', 'low', 'close'))
+                self.record(f"indicators.vectorized[{count}]",
+                            measure(lambda: compute_indicators(high, low, close, params), repeat))
+
+            if self.wanted(f"indicators.ta[{count}]"):
+                try:
+                    import pandas as pd
+                    import ta
+                except ImportError:
+                    logger.info("ta not installed; skipping the ta reference benchmarks")
+                    continue
+
+                def reference():
+                    # The original get_market_data pipeline
+                    df = pd.DataFrame(rates)
+                    df['time'] = pd.to_datetime(df['time'], unit='s')
+                    df['ema'] = ta.trend.ema_indicator(df['close'], window=params.ema_window)
+                    df['rsi'] = ta.momentum.rsi(df['close'], window=params.rsi_window)
+                    df['atr'] = ta.volatility.average_true_range(df['high'], df['low'], df['close'], window=params.atr_window)
+                    df['momentum'] = df['close'].pct_change(params.momentum_period)
+                    return df.dropna()
+                self.record(f"indicators.ta[{count}]", measure(reference, repeat))
+
+    async def bench_get_market_data(self):
+        trader = self.trader
+        for count in BAR_COUNTS:
+            name = f"get_market_data.cold[{count}]"
+            if not self.wanted(name):
+                continue
+            trader.bar_cache.history = count
+
+            def setup():
+                trader.bar_cache.reset()
+                trader.bar_series._map = None
+                if os.path.exists(trader.bar_series.path):
+                    os.remove(trader.bar_series.path)
+            self.record(name, await ameasure(trader.get_market_data, self.repeat(20 if count < 100000 else 3), setup=setup))
+        trader.bar_cache.history = 100
+        trader.bar_cache.reset()
+        await trader.get_market_data()
+
+    async def bench_check_conditions(self):
+        trader, engine = self.trader, self.engine
+        df = await trader.get_market_data()
+        if self.wanted("check_conditions"):
+            calls = 1000
+            async def many():
+                for _ in range(calls):
+                    await trader.check_conditions(df)
+            self.record("check_conditions", await ameasure(many, self.repeat(20), ops=calls))
+        if self.wanted("signal_pass"):
+            # Cache miss: a new bar forces the full strategy x instance pass
+            def new_bar():
+                engine.signal_versions = None
+            self.record("signal_pass", measure(engine.evaluate_signals, self.repeat(200), setup=new_bar))
+
+    async def bench_execute_trade(self):
+        if not self.wanted("execute_trade"):
+            return
+        trader, sim = self.trader, self.sim
+        await trader.get_market_data()
+
+        def reset():
+            sim.positions.clear()
+            trader.active_trades = []
+        self.record("execute_trade", await ameasure(
+            lambda: trader.execute_trade('bullish', 'normal'), self.repeat(200), setup=reset
+        ))
+        reset()
+
+    async def bench_close_all_trades(self):
+        trader, sim = self.trader, self.sim
+        for count in POSITION_COUNTS:
+            name = f"close_all_trades[{count}]"
+            if not self.wanted(name):
+                continue
+
+            def open_positions():
+                sim.positions.clear()
+                tick = sim.symbol_info_tick(trader.symbol)
+                for _ in range(count):
+                    sim.order_send({
+                        "action": sim.TRADE_ACTION_DEAL, "symbol": trader.symbol, "volume": 0.01,
+                        "type": sim.ORDER_TYPE_BUY, "price": tick.ask, "deviation": 5, "magic": trader.magic,
+                    })
+                trader.snapshots.invalidate_trading()
+            self.record(name, await ameasure(trader.close_all_trades, self.repeat(10), setup=open_positions))
+
+    async def bench_send_message(self):
+        if not self.wanted("send_message"):
+            return
+        sink = SlowSink()
+        dispatcher = NotificationDispatcher([sink], maxsize=200)
+        self.engine.notifier, original = dispatcher, self.engine.notifier
+        messages = 1000
+        try:
+            async def burst():
+                for index in range(messages):
+                    await self.trader.send_message(f"benchmark message {index}")
+            self.record("send_message[slow_sink]", await ameasure(burst, self.repeat(10), ops=messages))
+        finally:
+            self.engine.notifier = original
+            await dispatcher.close()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> list:
+    # Returns (name, baseline median, current median, ratio, regressed)
+    rows = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        rows.append((name, base['median_s'], result['median_s'], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the trading loop hot paths")
+    parser.add_argument("--out", default="benchmark_results.json", help="Write results here")
+    parser.add_argument("--baseline", default=None, help="Compare against this saved result file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed median slowdown before flagging")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions")
+    args = parser.parse_args()
+
+    # Keep per-message INFO logging out of the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+    results = asyncio.run(Suite(args.quick, args.filter).run())
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(results)} results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline['results'], args.tolerance)
+        logger.info(f"\nAgainst {args.baseline} (commit {baseline['meta'].get('commit')}):")
+        for name, base, current, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            logger.info(f"{name:<40} {base * 1e6:12.1f} -> {current * 1e6:12.1f} us  x{ratio:5.2f}{flag}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
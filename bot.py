@@ -3,30 +3,119 @@ from discord.ext import commands
 import os
 import asyncio
 import logging
-import MetaTrader5 as mt5
+import time
+import zlib
+from dataclasses import asdict
+import numpy as np
 import pandas as pd
-import ta
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from telegram.ext import Application, CommandHandler
+from broker import load_broker
+from market_data import RATES_DTYPE, BarCache
+from bar_store import BarStore
+from strategy import StrategyParams, lot_for_strength, trade_levels
+from signals import SIGNAL_COLUMNS, SignalEngine, load_strategies, signal_labels
+from scheduler import TickScheduler
+from metrics import metrics, profiler, start_http_server
+from mt5_executor import MT5Executor
+from snapshots import BrokerSnapshots
+from journal import InstanceState, TradeJournal
+from risk import DRAWDOWN, PHASE_LOSS, RiskEngine, RiskLimits
+from fanout import FanOut, load_accounts
+from control import CommandRouter, status_routes
+from notifications import HIGH, LOW, NORMAL, DiscordSink, LogSink, NotificationDispatcher, TelegramSink
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.getLogger("httpx").setLevel(logging.WARNING)  # Suppress HTTP logs
 logger = logging.getLogger(__name__)
 
+mt5 = load_broker()  # MetaTrader5, or the in-process simulator with TRADER_BROKER=sim
+mt5_executor = MT5Executor(mt5)
+
+MAGIC = 40022024
+REQUOTE_RETCODES = (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED)
+TIMEFRAME_SECONDS = {
+    "M1": 60,
+    "M5": 5 * 60,
+    "M15": 15 * 60,
+    "M30": 30 * 60,
+    "H1": 60 * 60,
+    "H4": 4 * 60 * 60,
+    "D1": 24 * 60 * 60,
+}
+
+
+async def mt5_call(name: str, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return await mt5_executor.call(name, *args, **kwargs)
+    except Exception:
+        metrics.inc("mt5_errors_total", call=name)
+        raise
+    finally:
+        metrics.observe("mt5_call_seconds", time.perf_counter() - started, call=name)
+
+
+async def pause(seconds: float):
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    metrics.observe("loop_sleep_seconds", time.perf_counter() - started)
+
+
+def instance_magic(symbol: str, timeframe: str) -> int:
+    # Stable per symbol:timeframe, so reordering TRADER_INSTANCES never hands
+    # one instance's positions (and journaled tickets) to another. XAUUSD:M15
+    # keeps the magic the single-instance bot always used.
+    if (symbol, timeframe) == ("XAUUSD", "M15"):
+        return MAGIC
+    return MAGIC + 1 + zlib.crc32(f"{symbol}:{timeframe}".encode()) % 1000000
+
+
+def parse_instances(spec: str) -> List[Tuple[str, str, int]]:
+    # "XAUUSD:M15,EURUSD:H1:40022100" -> [("XAUUSD", "M15", magic), ("EURUSD", "H1", 40022100)]
+    # An explicit magic overrides the one derived from symbol:timeframe.
+    instances = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        symbol, _, rest = item.partition(":")
+        timeframe, _, magic = rest.partition(":")
+        timeframe = (timeframe or "M15").upper()
+        if timeframe not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Unsupported timeframe {timeframe} for {symbol}")
+        if any(instance[:2] == (symbol, timeframe) for instance in instances):
+            raise ValueError(f"Duplicate instance {symbol}:{timeframe}")
+        instances.append((symbol, timeframe, int(magic) if magic else instance_magic(symbol, timeframe)))
+    if not instances:
+        raise ValueError("No trading instances configured")
+    return instances
+
+
 class PhaseTraderPro:
-    def __init__(self, discord_bot=None, telegram_app=None, telegram_chat_id=None):
-        self.discord_bot = discord_bot
-        self.telegram_app = telegram_app
-        self.telegram_chat_id = telegram_chat_id
+    def __init__(self, engine, symbol="XAUUSD", timeframe="M15", magic=MAGIC, params: Optional[StrategyParams] = None):
+        self.engine = engine
         self.max_trades_per_phase = None
         self.profit_target_per_phase = None
         self.max_phases = None
-        self.base_lot = 0.02
-        self.strong_lot = 0.04
-        self.strong_move_threshold = 1.8
-        self.symbol = "XAUUSD"
+        self.params = params or StrategyParams()
+        self.symbol = symbol
+        self.timeframe_name = timeframe
+        self.timeframe = getattr(mt5, f"TIMEFRAME_{timeframe}")
+        self.magic = magic
+        self.close_concurrency = 8
+        self.bar_cache = BarCache(
+            self.symbol, self.timeframe, period_seconds=TIMEFRAME_SECONDS[timeframe], params=self.params
+        )
+        self.bar_series = engine.bar_store.series(symbol, timeframe)
+        self.store_contiguous = False  # the cache's window continues the stored bars
+        self.scheduler = TickScheduler(
+            TIMEFRAME_SECONDS[timeframe],
+            price_threshold=float(os.getenv("TRADER_PRICE_THRESHOLD", "0.0005")),
+            poll_interval=float(os.getenv("TRADER_POLL_INTERVAL", "0.25")),
+        )
         self.current_phase = 1
         self.current_trend = None
         self.active_trades = []
@@ -34,97 +123,73 @@ class PhaseTraderPro:
         self.market_status_count = 0
         self.session_start = datetime.now()
         self.running = False
-        self.awaiting_input = None
-
-    async def send_message(self, text: str, retries=3, delay=2):
-        logger.info(text)
-        if self.discord_bot and isinstance(self.discord_bot, commands.Bot):
-            for channel in self.discord_bot.get_all_channels():
-                if channel.name == "bot-test":  # Adjust channel name as needed
-                    await channel.send(text)
-                    break
-        if self.telegram_app and self.telegram_chat_id:
-            for attempt in range(retries):
-                try:
-                    await self.telegram_app.bot.send_message(chat_id=self.telegram_chat_id, text=text)
-                    return
-                except Exception as e:
-                    logger.error(f"Telegram send error (attempt {attempt + 1}/{retries}): {e}")
-                    if attempt < retries - 1:
-                        await asyncio.sleep(delay)
-            logger.error("Failed to send Telegram message after retries")
 
-    async def initialize(self):
-        await self.send_message("🔥 PHASE TRADER PRO v3.4 🔥")
-        if not await self.connect_mt5():
-            raise Exception("MT5 connection failed")
-        await self.send_message("Please send your configuration as:\n/config max_trades profit_target max_phases\nExample: /config 3 6.2 4")
-        self.awaiting_input = "config"
+    @property
+    def label(self) -> str:
+        return f"{self.symbol} {self.timeframe_name}"
 
-    async def connect_mt5(self, retries=3, delay=5):
-        for attempt in range(retries):
-            try:
-                if not mt5.initialize():
-                    logger.error("MT5 initialize() failed")
-                    await self.send_message("⚠️ MT5 initialize() failed")
-                    return False
+    @property
+    def instance_key(self) -> str:
+        return f"{self.symbol}:{self.timeframe_name}"
 
-                authorized = await asyncio.to_thread(
-                    mt5.login,
-                    login=int(os.getenv("MT5_LOGIN")),
-                    password=os.getenv("MT5_PASSWORD"),
-                    server=os.getenv("MT5_SERVER", "Deriv-Demo")
-                )
+    def record(self, kind: str, **data):
+        self.engine.journal.record(self.instance_key, kind, **data)
 
-                if not authorized:
-                    error = mt5.last_error()
-                    logger.error(f"MT5 login failed: {error}")
-                    await self.send_message(f"⚠️ MT5 login failed. Error: {error}")
-                    return False
+    def state(self) -> InstanceState:
+        return InstanceState(
+            self.max_trades_per_phase, self.profit_target_per_phase, self.max_phases,
+            self.current_phase, self.current_trend, list(self.active_trades), self.running,
+        )
 
-                if not await asyncio.to_thread(mt5.symbol_select, self.symbol, True):
-                    logger.error(f"Symbol {self.symbol} not available")
-                    await self.send_message(f"⚠️ Symbol {self.symbol} not available")
-                    return False
+    def restore(self, state: InstanceState):
+        if state.configured:
+            self.configure(state.max_trades, state.profit_target, state.max_phases)
+        self.current_phase = state.current_phase
+        self.current_trend = state.current_trend
+        self.active_trades = list(state.active_trades)
 
-                await self.send_message("✅ MT5 Connected to Deriv")
-                return True
-            except Exception as e:
-                logger.error(f"Connection error (attempt {attempt + 1}/{retries}): {str(e)}")
-                if attempt < retries - 1:
-                    await asyncio.sleep(delay)
-                continue
-        await self.send_message(f"⚠️ Failed to connect to MT5 after {retries} attempts")
-        return False
+    async def reconcile(self) -> str:
+        # The broker is the source of truth for open positions: journaled
+        # tickets that are gone were closed (TP/SL) while we were down, and
+        # positions carrying our magic but missing from the journal were
+        # opened just before the last unflushed batch.
+        positions = await self.get_positions(fresh=True)
+        if positions is None:
+            return f"phase {self.current_phase}, {len(self.active_trades)} open (positions unavailable, not reconciled)"
+        open_tickets = {pos.ticket for pos in positions}
+        closed = [ticket for ticket in self.active_trades if ticket not in open_tickets]
+        adopted = sorted(open_tickets - set(self.active_trades))
+        self.active_trades = [ticket for ticket in self.active_trades if ticket in open_tickets] + adopted
+        for pos in positions:
+            prefix, _, phase = (pos.comment or "").partition("-")
+            if prefix == "PHASE" and phase.isdigit():
+                self.current_phase = max(self.current_phase, int(phase))
+        self.phase_profit = sum(pos.profit for pos in positions)
+        if closed:
+            self.record("close", tickets=closed, reason="reconcile")
+        return (
+            f"phase {self.current_phase}, {len(self.active_trades)} open"
+            f" ({len(adopted)} adopted, {len(closed)} closed while offline)"
+        )
+
+    async def send_message(self, text: str, priority=NORMAL):
+        await self.engine.send_message(f"[{self.label}] {text}", priority)
+
+    @property
+    def snapshots(self) -> BrokerSnapshots:
+        return self.engine.snapshots
 
     async def get_equity(self) -> float:
-        try:
-            account_info = await asyncio.to_thread(mt5.account_info)
-            return account_info.equity if account_info else 0
-        except Exception as e:
-            logger.error(f"Equity fetch error: {str(e)}")
-            await self.send_message(f"⚠️ Equity fetch error: {str(e)}")
-            return None
+        return await self.engine.get_equity()
 
-    async def handle_config(self, max_trades: str, profit_target: str, max_phases: str):
-        try:
-            max_trades = int(max_trades)
-            profit_target = float(profit_target)
-            max_phases = int(max_phases)
-            if max_trades <= 0:
-                raise ValueError("Max trades must be positive")
-            if profit_target <= 0:
-                raise ValueError("Profit target must be positive")
-            if max_phases <= 0:
-                raise ValueError("Max phases must be positive")
-            self.max_trades_per_phase = max_trades
-            self.profit_target_per_phase = profit_target
-            self.max_phases = max_phases
-            self.awaiting_input = None
-            await self.print_status()
-            await self.send_message("✅ Configuration saved! Send /run to begin trading")
-        except ValueError as e:
-            await self.send_message(f"⚠️ Invalid input: {str(e)}. Example: /config 3 6.2 4")
+    def configure(self, max_trades: int, profit_target: float, max_phases: int):
+        self.max_trades_per_phase = max_trades
+        self.profit_target_per_phase = profit_target
+        self.max_phases = max_phases
+
+    @property
+    def configured(self) -> bool:
+        return None not in (self.max_trades_per_phase, self.profit_target_per_phase, self.max_phases)
 
     async def print_status(self):
         equity = await self.get_equity()
@@ -142,45 +207,124 @@ class PhaseTraderPro:
         )
         await self.send_message(status_msg)
 
+    def status(self) -> dict:
+        # In-memory view for /status: loop state, the risk book as of its
+        # last mark and the latest bar; never calls MT5
+        risk = self.engine.risk
+        book = risk.books.get(self.instance_key)
+        last = self.bar_cache.last
+        trend, strength = self.engine.signals.get((self.engine.signal_engine.live.name, self.instance_key), (None, None))
+        positions = []
+        if book is not None:
+            for ticket, position in book.positions.items():
+                positions.append({
+                    "ticket": ticket,
+                    "side": "buy" if position[0] else "sell",
+                    "price_open": position[2],
+                    "pnl": book._position_pnl(position, book.bid, book.ask) if book.bid is not None else None,
+                })
+        return {
+            "instance": self.instance_key,
+            "running": self.running,
+            "phase": self.current_phase,
+            "max_phases": self.max_phases,
+            "trend": self.current_trend,
+            "signal": {"trend": trend, "strength": strength},
+            "trades": len(self.active_trades),
+            "max_trades": self.max_trades_per_phase,
+            "profit_target": self.profit_target_per_phase,
+            "open_pnl": risk.open_pnl(self.instance_key),
+            "phase_pnl": risk.phase_pnl(self.instance_key),
+            "volume": book.volume if book else 0.0,
+            "bid": book.bid if book else None,
+            "ask": book.ask if book else None,
+            "positions": positions,
+            "synced_at": risk.synced.get(self.instance_key),
+            "bar": {"time": int(last['time']), "close": float(last['close'])} if last else None,
+        }
+
     async def get_market_data(self, retries=3, delay=5) -> Optional[pd.DataFrame]:
+        cache = self.bar_cache
+        if cache.is_fresh():
+            return cache.frame()
         for attempt in range(retries):
             try:
-                rates = await asyncio.to_thread(
-                    mt5.copy_rates_from_pos, self.symbol, mt5.TIMEFRAME_M15, 0, 100
-                )
+                rates = await self.fetch_rates()
                 if rates is None or len(rates) == 0:
                     raise ValueError("No data returned from MT5")
-                df = pd.DataFrame(rates)
-                if 'time' not in df.columns or df.empty:
+                if 'time' not in rates.dtype.names:
                     raise ValueError("Invalid data structure")
-                df['time'] = pd.to_datetime(df['time'], unit='s', errors='coerce')
-                df = df.dropna(subset=['time'])
-
-                df['ema21'] = ta.trend.ema_indicator(df['close'], window=21)
-                df['rsi'] = ta.momentum.rsi(df['close'], window=14)
-                df['atr'] = ta.volatility.average_true_range(df['high'], df['low'], df['close'], window=14)
-                df['momentum'] = df['close'].pct_change(3)
-                return df.dropna()
+                with metrics.timer("loop_stage_seconds", stage="indicators", symbol=self.symbol):
+                    applied = cache.apply(rates)
+                if not applied:
+                    # Gap since the last fetch; rebuild from a full history window
+                    metrics.inc("bar_cache_reloads_total", symbol=self.symbol)
+                    cache.reset()
+                    self.store_contiguous = False
+                    rates = await mt5_call("copy_rates_from_pos", self.symbol, self.timeframe, 0, cache.fetch_count())
+                    with metrics.timer("loop_stage_seconds", stage="indicators", symbol=self.symbol):
+                        applied = cache.apply(rates)
+                    if not applied:
+                        raise ValueError("No data returned from MT5")
+                with metrics.timer("loop_stage_seconds", stage="dataframe", symbol=self.symbol):
+                    df = cache.frame()
+                if df.empty:
+                    raise ValueError("Not enough bars for indicators")
+                # Everything but the forming bar is final; persist it for warm starts and backtests
+                with metrics.timer("loop_stage_seconds", stage="bar_store", symbol=self.symbol):
+                    await self.store_bars(rates[:-1])
+                return df
             except Exception as e:
-                logger.error(f"Data error (attempt {attempt + 1}/{retries}): {str(e)}")
+                metrics.inc("data_errors_total", symbol=self.symbol)
+                logger.error(f"[{self.label}] Data error (attempt {attempt + 1}/{retries}): {str(e)}")
                 if attempt < retries - 1:
                     await asyncio.sleep(delay)
                 continue
-        logger.error("Failed to fetch market data after retries")
+        logger.error(f"[{self.label}] Failed to fetch market data after retries")
         await self.send_message("⚠️ Failed to fetch market data")
         return None
 
+    async def store_bars(self, closed):
+        # Appends closed bars to the local store without leaving holes: a
+        # window that starts after the newest stored bar (cold start on an old
+        # store, or a reload after a gap) is bridged from the terminal first,
+        # and refused if the terminal no longer has the missing bars.
+        if len(closed) == 0:
+            return
+        series = self.bar_series
+        last = series.last_time()
+        if not self.store_contiguous and last is not None and closed['time'][0] > last:
+            hole = await mt5_call("copy_rates_range", self.symbol, self.timeframe, last, int(closed['time'][0]) - 1)
+            if hole is None or len(hole) == 0 or hole['time'][0] > last:
+                metrics.inc("bar_store_gaps_total", symbol=self.symbol)
+                logger.warning(f"[{self.label}] Not storing bars: the terminal has no history back to the newest stored bar")
+                return
+            closed = np.concatenate((hole.astype(RATES_DTYPE, copy=False), closed))
+        series.append(closed, contiguous=self.store_contiguous)
+        self.store_contiguous = True
+
+    async def fetch_rates(self):
+        cache = self.bar_cache
+        if cache.empty:
+            stored = self.bar_series.tail(cache.history)
+            if len(stored):
+                # Warm start: history from the local store, and from the terminal
+                # only the bars since the newest stored one
+                recent = await mt5_call(
+                    "copy_rates_range", self.symbol, self.timeframe, int(stored['time'][-1]), int(time.time()) + 86400
+                )
+                # Only when the terminal still has the newest stored bar;
+                # otherwise the window would have a hole, so fetch it cold
+                if recent is not None and len(recent) and recent['time'][0] <= stored['time'][-1]:
+                    metrics.inc("bar_store_warm_starts_total", symbol=self.symbol)
+                    recent = recent.astype(RATES_DTYPE, copy=False)
+                    return np.concatenate((stored[stored['time'] < recent['time'][0]], recent))
+        return await mt5_call("copy_rates_from_pos", self.symbol, self.timeframe, 0, cache.fetch_count())
+
     async def check_conditions(self, df: pd.DataFrame) -> Tuple[Optional[str], Optional[str]]:
         if df is None or df.empty:
             return None, None
-        last = df.iloc[-1]
-        if last['close'] > last['ema21'] and last['rsi'] > 55:
-            strength = 'extreme' if last['momentum'] > (last['atr'] * self.strong_move_threshold) else 'normal'
-            return 'bullish', strength
-        elif last['close'] < last['ema21'] and last['rsi'] < 45:
-            strength = 'extreme' if abs(last['momentum']) > (last['atr'] * self.strong_move_threshold) else 'normal'
-            return 'bearish', strength
-        return None, None
+        return self.engine.signal_for(self)
 
     async def execute_trade(self, trend_type: str, strength: str) -> bool:
         if len(self.active_trades) >= self.max_trades_per_phase:
@@ -188,8 +332,13 @@ class PhaseTraderPro:
             return False
 
         try:
-            lot_size = self.strong_lot if strength == 'extreme' else self.base_lot
-            tick = await asyncio.to_thread(mt5.symbol_info_tick, self.symbol)
+            lot_size = lot_for_strength(strength, self.params)
+            blocked = self.engine.risk.allow_order(self.symbol, lot_size)
+            if blocked:
+                metrics.inc("orders_total", symbol=self.symbol, result="blocked")
+                await self.send_message(f"🛡️ Order blocked: {blocked}", LOW)
+                return False
+            tick = await self.snapshots.tick(self.symbol)
             if not tick:
                 await self.send_message("⚠️ Failed to get market tick")
                 return False
@@ -197,14 +346,9 @@ class PhaseTraderPro:
             df = await self.get_market_data()
             if df is None:
                 return False
-            atr = df['atr'].iloc[-1]
-
-            tp_distance = 3 * atr
-            sl_distance = 1.5 * atr
-            tp_price = price + tp_distance if trend_type == 'bullish' else price - tp_distance
-            sl_price = price - sl_distance if trend_type == 'bullish' else price + sl_distance
+            tp_price, sl_price = trade_levels(price, df['atr'].iloc[-1], trend_type, self.params)
 
-            symbol_info = await asyncio.to_thread(mt5.symbol_info, self.symbol)
+            symbol_info = await self.snapshots.symbol_spec(self.symbol)
             if not symbol_info or lot_size < symbol_info.volume_min or lot_size > symbol_info.volume_max:
                 await self.send_message(f"⚠️ Invalid lot size: {lot_size}")
                 return False
@@ -218,33 +362,52 @@ class PhaseTraderPro:
                 "sl": sl_price,
                 "tp": tp_price,
                 "deviation": 5,
-                "magic": 40022024,
+                "magic": self.magic,
                 "comment": f"PHASE-{self.current_phase}",
             }
 
-            result = await asyncio.to_thread(mt5.order_send, request)
+            result = await mt5_call("order_send", request)
+            self.snapshots.invalidate_trading()
+            self.engine.risk.invalidate(self.instance_key)
             if result.retcode == mt5.TRADE_RETCODE_DONE:
+                fanout = self.engine.fanout
+                if fanout:
+                    # Only filled orders are copied; followers size and price their own copy
+                    fanout.submit(fanout.open(
+                        self.symbol, self.magic, trend_type, strength, price, abs(tp_price - price), abs(sl_price - price)
+                    ))
+                metrics.inc("orders_total", symbol=self.symbol, result="done")
                 self.active_trades.append(result.order)
+                self.record(
+                    "order", ticket=result.order, direction=trend_type, volume=lot_size,
+                    price=price, sl=sl_price, tp=tp_price, phase=self.current_phase,
+                )
                 trade_msg = (
                     f"\n🚀 NEW {trend_type.upper()} TRADE\n"
                     f"• Price: {price} | Lots: {lot_size}\n"
                     f"• TP: {tp_price:.5f} | SL: {sl_price:.5f} | Phase: {self.current_phase}"
                 )
-                await self.send_message(trade_msg)
+                await self.send_message(trade_msg, HIGH)
                 return True
             else:
+                metrics.inc("orders_total", symbol=self.symbol, result="failed")
                 await self.send_message(f"❌ Trade failed: {result.comment}")
                 return False
         except Exception as e:
-            logger.error(f"Trade execution error: {str(e)}")
+            metrics.inc("orders_total", symbol=self.symbol, result="error")
+            logger.error(f"[{self.label}] Trade execution error: {str(e)}")
             await self.send_message(f"⚠️ Trade execution error: {str(e)}")
             return False
 
-    async def monitor_phase(self):
-        try:
-            positions = await asyncio.to_thread(mt5.positions_get, symbol=self.symbol)
-            self.phase_profit = sum(pos.profit for pos in positions) if positions else 0
+    async def get_positions(self, fresh=False) -> Optional[list]:
+        # None when positions_get() failed
+        positions = await self.snapshots.positions(self.symbol, fresh=fresh)
+        if positions is None:
+            return None
+        return [pos for pos in positions if pos.magic == self.magic]
 
+    async def report_market_status(self):
+        try:
             df = await self.get_market_data()
             equity = await self.get_equity()
             equity_display = f"${equity:.2f}" if equity is not None else "N/A"
@@ -253,19 +416,32 @@ class PhaseTraderPro:
                 self.market_status_count += 1
                 await self.send_message(
                     f"\n📊 Market Status #{self.market_status_count}:\n"
-                    f"• Price: {last['close']} | EMA21: {last['ema21']:.2f}\n"
+                    f"• Price: {last['close']} | EMA{self.params.ema_window}: {last['ema']:.2f}\n"
                     f"• RSI: {last['rsi']:.1f} | Momentum: {last['momentum']*100:.2f}%\n"
                     f"• Active Trend: {self.current_trend or 'None'}\n"
                     f"• Phase Profit: ${self.phase_profit:.2f}\n"
-                    f"• Account Equity: {equity_display}"
+                    f"• Account Equity: {equity_display}",
+                    LOW,
                 )
+        except Exception as e:
+            logger.error(f"[{self.label}] Market status error: {str(e)}")
+
+    async def monitor_phase(self):
+        try:
+            # Floating P&L of the phase's open positions, marked on every tick by the risk engine
+            self.phase_profit = self.engine.risk.open_pnl(self.instance_key)
 
             if self.phase_profit >= self.profit_target_per_phase:
+                profit = self.phase_profit
+                if not await self.close_all_trades():
+                    # Some trades are still open (or positions could not be read);
+                    # stay in this phase and retry on the next tick
+                    logger.warning(f"[{self.label}] Phase {self.current_phase} target reached but not closed out, retrying")
+                    return True
                 await self.send_message(
-                    f"\n🎯 PHASE {self.current_phase} COMPLETED!\nProfit: ${self.phase_profit:.2f}"
+                    f"\n🎯 PHASE {self.current_phase} COMPLETED!\nProfit: ${profit:.2f}",
+                    HIGH,
                 )
-                await self.close_all_trades()
-                self.active_trades = []
 
                 if self.max_phases is not None and self.current_phase >= self.max_phases:
                     await self.send_message(f"🏁 Max phases ({self.max_phases}) reached! Bot stopped.")
@@ -274,48 +450,151 @@ class PhaseTraderPro:
 
                 self.current_phase += 1
                 self.phase_profit = 0
+                self.engine.risk.reset_phase(self.instance_key)
+                self.record("phase", phase=self.current_phase, completed_profit=profit)
                 self.market_status_count = 0
                 await self.print_status()
                 return True
             return False
         except Exception as e:
-            logger.error(f"Monitor phase error: {str(e)}")
+            logger.error(f"[{self.label}] Monitor phase error: {str(e)}")
             await self.send_message(f"⚠️ Monitor phase error: {str(e)}")
             return False
 
-    async def close_all_trades(self):
+    async def refresh_risk(self):
+        positions = await self.get_positions()
+        if positions is None:
+            return  # keep the book as is; an empty sync would book every position as closed
+        spec = await self.snapshots.symbol_spec(self.symbol)
+        account = await self.snapshots.account()
+        value_per_price = spec.trade_tick_value / spec.trade_tick_size if spec and spec.trade_tick_size else 0.0
+        self.engine.risk.sync(
+            self.instance_key, self.symbol, positions, value_per_price,
+            account.balance if account else None, mt5.ORDER_TYPE_BUY,
+        )
+
+    async def close_position(self, pos, tick, semaphore: asyncio.Semaphore, retries=3) -> dict:
+        result = {"ticket": pos.ticket, "ok": False, "retcode": None, "comment": "", "price": None, "attempts": 0}
+        async with semaphore:
+            for attempt in range(retries):
+                if attempt:
+                    metrics.inc("close_retries_total", symbol=self.symbol)
+                if attempt or not tick:
+                    # Requoted or no snapshot: price the retry off a fresh tick
+                    tick = await self.snapshots.tick(self.symbol, fresh=True)
+                if not tick:
+                    result["comment"] = "No market tick"
+                    continue
+                close_price = tick.bid if pos.type == mt5.ORDER_TYPE_BUY else tick.ask
+                request = {
+                    "action": mt5.TRADE_ACTION_DEAL,
+                    "symbol": self.symbol,
+                    "volume": pos.volume,
+                    "type": mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY,
+                    "position": pos.ticket,
+                    "price": close_price,
+                    "deviation": 5,
+                    "magic": self.magic,
+                    "comment": "PHASE-END",
+                }
+                order = await mt5_call("order_send", request)
+                result["attempts"] = attempt + 1
+                result["price"] = close_price
+                if order is None:
+                    result["comment"] = str(await mt5_call("last_error"))
+                    break
+                result["retcode"] = order.retcode
+                result["comment"] = order.comment
+                if order.retcode == mt5.TRADE_RETCODE_DONE:
+                    result["ok"] = True
+                    break
+                metrics.inc("close_failures_total", symbol=self.symbol, retcode=order.retcode)
+                if order.retcode not in REQUOTE_RETCODES:
+                    break
+        return result
+
+    async def close_all_trades(self) -> bool:
+        # Follower accounts close their copies of this instance's positions in
+        # parallel, on every path that closes the primary's
+        started = time.perf_counter()
+        fanout = self.engine.fanout
+        followers = fanout.submit(fanout.close(self.magic, self.symbol)) if fanout else None
+        closed = False
         try:
-            positions = await asyncio.to_thread(mt5.positions_get, symbol=self.symbol)
-            if positions:
-                for pos in positions:
-                    tick = await asyncio.to_thread(mt5.symbol_info_tick, self.symbol)
-                    if not tick:
-                        continue
-                    close_price = tick.bid if pos.type == mt5.ORDER_TYPE_BUY else tick.ask
-                    request = {
-                        "action": mt5.TRADE_ACTION_DEAL,
-                        "symbol": self.symbol,
-                        "volume": pos.volume,
-                        "type": mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY,
-                        "position": pos.ticket,
-                        "price": close_price,
-                        "comment": "PHASE-END",
-                    }
-                    await asyncio.to_thread(mt5.order_send, request)
-                await self.send_message("🛑 All trades closed")
+            positions = await self.get_positions(fresh=True)
+            if positions is None:
+                error = await mt5_call("last_error")
+                await self.send_message(f"⚠️ Close trades error: could not read positions ({error})", HIGH)
+            elif positions:
+                # One shared tick snapshot prices every close; requotes refresh it
+                tick = await self.snapshots.tick(self.symbol)
+                semaphore = asyncio.Semaphore(self.close_concurrency)
+                results = await asyncio.gather(*(self.close_position(pos, tick, semaphore) for pos in positions))
+                self.snapshots.invalidate_trading()
+                self.engine.risk.invalidate(self.instance_key)
+                # Positions that failed to close stay tracked; everything else is gone
+                remaining = [result["ticket"] for result in results if not result["ok"]]
+                gone = [ticket for ticket in self.active_trades if ticket not in remaining]
+                self.active_trades = remaining
+                self.engine.risk.settle(
+                    self.instance_key, remaining, {result["ticket"]: result["price"] for result in results if result["ok"]}
+                )
+                self.record("close", tickets=gone)
+                elapsed = time.perf_counter() - started
+                metrics.observe("loop_stage_seconds", elapsed, stage="close_all", symbol=self.symbol)
+                elapsed_ms = elapsed * 1000
+                failed = [result for result in results if not result["ok"]]
+                closed = not failed
+                if failed:
+                    details = "\n".join(f"• #{r['ticket']}: {r['comment'] or r['retcode']}" for r in failed)
+                    await self.send_message(
+                        f"⚠️ Closed {len(results) - len(failed)}/{len(results)} trades in {elapsed_ms:.0f} ms\n{details}",
+                        HIGH,
+                    )
+                else:
+                    await self.send_message(f"🛑 All trades closed ({len(results)} in {elapsed_ms:.0f} ms)", HIGH)
             else:
+                self.engine.risk.settle(self.instance_key, ())
+                closed = True
+                if self.active_trades:
+                    self.record("close", tickets=self.active_trades, reason="not found")
+                    self.active_trades = []
                 await self.send_message("No open positions to close")
         except Exception as e:
-            logger.error(f"Close trades error: {str(e)}")
+            logger.error(f"[{self.label}] Close trades error: {str(e)}")
             await self.send_message(f"⚠️ Close trades error: {str(e)}")
+        if followers is not None:
+            await asyncio.gather(followers, return_exceptions=True)
+        return closed
+
+    async def evaluate(self, tick):
+        df = await self.get_market_data()
+        if df is None:
+            return
+        self.scheduler.mark_evaluated(tick)
+
+        with metrics.timer("loop_stage_seconds", stage="signal", symbol=self.symbol):
+            trend_type, strength = await self.check_conditions(df)
+
+        if trend_type and trend_type != self.current_trend:
+            self.current_trend = trend_type
+            self.record("trend", trend=trend_type)
+            if self.active_trades:
+                await self.send_message(f"⚠️ Trend changed to {trend_type}, closing existing trades")
+                await self.close_all_trades()
+
+        if trend_type and len(self.active_trades) < self.max_trades_per_phase:
+            with metrics.timer("loop_stage_seconds", stage="execute", symbol=self.symbol):
+                await self.execute_trade(trend_type, strength)
 
     async def run(self):
-        if None in (self.max_trades_per_phase, self.profit_target_per_phase, self.max_phases):
+        if not self.configured:
             await self.send_message("⚠️ Please configure first with /config")
             return
 
         self.running = True
-        await self.send_message("Time to risk it all 😁😁😁😁😢😢😢")
+        self.record("run")
+        scheduler = self.scheduler
 
         try:
             while self.running:
@@ -324,57 +603,437 @@ class PhaseTraderPro:
                     self.stop()
                     break
 
-                if await self.monitor_phase():
+                # Fast path: nothing to do until the terminal reports a new tick
+                tick = await self.snapshots.tick(self.symbol)
+                if not scheduler.is_new_tick(tick):
+                    await pause(scheduler.poll_interval)
+                    continue
+
+                # Risk limits are checked first on every new tick so a breach
+                # closes positions before anything else runs
+                with metrics.timer("loop_stage_seconds", stage="risk", symbol=self.symbol):
+                    risk = self.engine.risk
+                    if risk.needs_sync(self.instance_key):
+                        await self.refresh_risk()
+                    breach = risk.on_tick(self.instance_key, tick.bid, tick.ask)
+                if breach:
+                    await self.engine.handle_breach(self, breach)
                     if not self.running:
                         break
-                    await asyncio.sleep(10)
                     continue
 
-                df = await self.get_market_data()
-                if df is None:
-                    await asyncio.sleep(10)
+                with metrics.timer("loop_stage_seconds", stage="monitor", symbol=self.symbol):
+                    completed = await self.monitor_phase()
+                if completed:
+                    if not self.running:
+                        break
                     continue
 
-                trend_type, strength = await self.check_conditions(df)
+                if scheduler.status_due():
+                    with metrics.timer("loop_stage_seconds", stage="status", symbol=self.symbol):
+                        await self.report_market_status()
+
+                # Full evaluation only on a bar close or a large enough price move
+                if scheduler.should_evaluate(tick):
+                    with metrics.timer("loop_stage_seconds", stage="evaluate", symbol=self.symbol):
+                        await self.evaluate(tick)
+
+                await pause(scheduler.poll_interval)
+        except Exception as e:
+            logger.error(f"[{self.label}] Critical error: {str(e)}")
+            await self.send_message(f"⚠️ Critical error: {str(e)}")
+        finally:
+            await self.send_message("🛑 Strategy STOPPED")
+            self.running = False
+
+    def stop(self):
+        # Only an explicit stop is journaled: after a crash or restart the
+        # instance resumes where it left off
+        if self.running:
+            self.record("stop")
+        self.running = False
+
+
+# Runs every (symbol, timeframe) strategy instance in one process over a
+# shared MT5 session and a shared Discord/Telegram notification pipeline.
+class TradingEngine:
+    def __init__(self, discord_bot=None, telegram_app=None, telegram_chat_id=None, instances=(("XAUUSD", "M15"),)):
+        self.discord_bot = discord_bot
+        self.telegram_app = telegram_app
+        self.telegram_chat_id = telegram_chat_id
+        sinks = [LogSink()]
+        if discord_bot and isinstance(discord_bot, commands.Bot):
+            sinks.append(DiscordSink(discord_bot, channel_name="bot-test"))  # Adjust channel name as needed
+        if telegram_app and telegram_chat_id:
+            sinks.append(TelegramSink(telegram_app, telegram_chat_id))
+        self.notifier = NotificationDispatcher(sinks)
+        self.snapshots = BrokerSnapshots(mt5_call)
+        self.journal = TradeJournal(os.getenv("TRADER_JOURNAL", "trader_journal.db"))
+        self.bar_store = BarStore(os.getenv("TRADER_BAR_STORE", "bars"))
+        self.risk = RiskEngine(RiskLimits.from_env())
+        self.fanout = FanOut(
+            load_accounts(os.getenv("TRADER_ACCOUNTS")), notify=lambda text: self.notifier.publish(text, HIGH)
+        )
+        self.signal_engine = SignalEngine(load_strategies(os.getenv("TRADER_STRATEGIES")))
+        self.signal_versions = None
+        self.signals = {}
+        self.traders = []
+        for symbol, timeframe, *magic in instances:
+            magic = magic[0] if magic else instance_magic(symbol, timeframe)
+            if any(trader.magic == magic for trader in self.traders):
+                raise ValueError(f"Magic number {magic} of {symbol}:{timeframe} is already used by another instance")
+            self.traders.append(PhaseTraderPro(self, symbol, timeframe, magic=magic, params=self.signal_engine.live.params))
+        self.router = CommandRouter(self)
+        self.run_task: Optional[asyncio.Task] = None
+        self.close_on_stop = False  # set by /stop: run() closes every position before shutting MT5 down
+        self.connected = False
+        self.running = False
+
+    @property
+    def configured(self) -> bool:
+        return all(trader.configured for trader in self.traders)
+
+    async def send_message(self, text: str, priority=NORMAL):
+        # Only enqueues; delivery happens on the dispatcher's sink workers
+        self.notifier.publish(text, priority)
+
+    async def initialize(self):
+        await self.send_message("🔥 PHASE TRADER PRO v3.4 🔥")
+        if not await self.connect_mt5():
+            raise Exception("MT5 connection failed")
+        instances = ", ".join(trader.label for trader in self.traders)
+        await self.send_message(f"Trading instances: {instances}")
+        if self.fanout:
+            await self.fanout.start()
+            names = ", ".join(account.spec.name for account in self.fanout.accounts)
+            await self.send_message(f"📡 Fan-out accounts: {names or 'none started'}")
+        resume = await self.restore()
+        if resume:
+            labels = ", ".join(trader.label for trader in resume)
+            await self.send_message(f"♻️ Resuming trading from the journal: {labels}")
+            await self.start_trading(resume)
+        elif self.configured:
+            await self.send_message("✅ Configuration restored from the journal. Send /run to begin trading")
+        else:
+            await self.send_message("Please send your configuration as:\n/config max_trades profit_target max_phases\nExample: /config 3 6.2 4")
 
-                if trend_type and trend_type != self.current_trend:
-                    self.current_trend = trend_type
-                    if self.active_trades:
-                        await self.send_message(f"⚠️ Trend changed to {trend_type}, closing existing trades")
-                        await self.close_all_trades()
-                        self.active_trades = []
+    async def restore(self) -> list:
+        # Replays the journal into every instance, reconciles it with the
+        # open positions and returns the instances that were still running
+        # when the process went down; ones stopped by a risk limit, max
+        # phases or /stop stay stopped.
+        started = time.perf_counter()
+        states = self.journal.replay([trader.instance_key for trader in self.traders])
+        resume = []
+        for trader in self.traders:
+            state = states.get(trader.instance_key)
+            if state is None:
+                continue
+            trader.restore(state)
+            summary = await trader.reconcile()
+            checkpoint = trader.state()
+            checkpoint.running = state.running
+            self.journal.checkpoint(trader.instance_key, checkpoint)
+            if state.running:
+                resume.append(trader)
+            await self.send_message(f"[{trader.label}] ♻️ Restored: {summary}")
+        metrics.observe("loop_stage_seconds", time.perf_counter() - started, stage="restore", symbol="*")
+        if self.configured:
+            await self.configure_fanout()
+        return resume if self.configured else []
 
-                if trend_type and len(self.active_trades) < self.max_trades_per_phase:
-                    await self.execute_trade(trend_type, strength)
+    async def configure_fanout(self):
+        if self.fanout:
+            await self.fanout.configure({
+                trader.magic: {
+                    "max_trades": trader.max_trades_per_phase,
+                    "profit_target": trader.profit_target_per_phase,
+                    "max_phases": trader.max_phases,
+                    "params": asdict(trader.params),
+                }
+                for trader in self.traders
+            })
 
-                await asyncio.sleep(20)
+    async def connect_mt5(self, retries=3, delay=5):
+        for attempt in range(retries):
+            try:
+                if not await mt5_call("initialize"):
+                    logger.error("MT5 initialize() failed")
+                    await self.send_message("⚠️ MT5 initialize() failed")
+                    return False
+
+                authorized = await mt5_call(
+                    "login",
+                    login=int(os.getenv("MT5_LOGIN", "0")),
+                    password=os.getenv("MT5_PASSWORD"),
+                    server=os.getenv("MT5_SERVER", "Deriv-Demo")
+                )
+
+                if not authorized:
+                    error = await mt5_call("last_error")
+                    logger.error(f"MT5 login failed: {error}")
+                    await self.send_message(f"⚠️ MT5 login failed. Error: {error}")
+                    return False
+
+                for symbol in {trader.symbol for trader in self.traders}:
+                    if not await mt5_call("symbol_select", symbol, True):
+                        logger.error(f"Symbol {symbol} not available")
+                        await self.send_message(f"⚠️ Symbol {symbol} not available")
+                        return False
+
+                # Symbol specs are cached for the session; reload them on every (re)connect
+                self.snapshots.reset()
+                for trader in self.traders:
+                    await self.snapshots.symbol_spec(trader.symbol)
+
+                self.connected = True
+                await self.send_message("✅ MT5 Connected to Deriv")
+                return True
+            except Exception as e:
+                logger.error(f"Connection error (attempt {attempt + 1}/{retries}): {str(e)}")
+                if attempt < retries - 1:
+                    await asyncio.sleep(delay)
+                continue
+        await self.send_message(f"⚠️ Failed to connect to MT5 after {retries} attempts")
+        return False
+
+    def evaluate_signals(self):
+        # One vectorized pass over every strategy and every instance's latest
+        # bar, redone only when some instance's bars changed. Shadow strategy
+        # flips are journaled and counted but never traded.
+        versions = tuple(trader.bar_cache.version for trader in self.traders)
+        if versions == self.signal_versions:
+            return
+        self.signal_versions = versions
+        ready = [trader for trader in self.traders if not trader.bar_cache.empty]
+        if not ready:
+            return
+        rows = [trader.bar_cache.last for trader in ready]
+        with metrics.timer("loop_stage_seconds", stage="signal_pass", symbol="*"):
+            direction, strong = self.signal_engine.evaluate(
+                {name: [row[name] for row in rows] for name in SIGNAL_COLUMNS}
+            )
+        live = self.signal_engine.index[self.signal_engine.live.name]
+        for column, (trader, row) in enumerate(zip(ready, rows)):
+            for index, strategy in enumerate(self.signal_engine.strategies):
+                signal = signal_labels(direction[index, column], strong[index, column])
+                key = (strategy.name, trader.instance_key)
+                if index != live and signal != self.signals.get(key, (None, None)):
+                    metrics.inc("shadow_signals_total", strategy=strategy.name, symbol=trader.symbol,
+                                direction=signal[0] or "none")
+                    trader.record("signal", strategy=strategy.name, trend=signal[0], strength=signal[1],
+                                  price=row['close'], bar_time=row['time'])
+                self.signals[key] = signal
+
+    def signal_for(self, trader) -> Tuple[Optional[str], Optional[str]]:
+        self.evaluate_signals()
+        return self.signals.get((self.signal_engine.live.name, trader.instance_key), (None, None))
+
+    async def handle_breach(self, trader, breach: str):
+        if not trader.running:
+            return  # another instance already tripped an account-wide limit
+        metrics.inc("risk_breaches_total", limit=breach, symbol=trader.symbol)
+        risk = self.risk
+        if breach == PHASE_LOSS:
+            await trader.send_message(
+                f"🚨 Max phase loss hit (${risk.phase_pnl(trader.instance_key):.2f} in phase {trader.current_phase}), "
+                f"closing trades and stopping",
+                HIGH,
+            )
+            trader.stop()
+            await trader.close_all_trades()
+            # The lost phase is over; a later /run starts its accounting afresh
+            risk.reset_phase(trader.instance_key)
+            return
+
+        if breach == DRAWDOWN:
+            drawdown = (risk.peak_equity - risk.equity) / risk.peak_equity * 100
+            await self.send_message(
+                f"🚨 Max equity drawdown hit ({drawdown:.2f}% from ${risk.peak_equity:.2f}), closing all trades and stopping",
+                HIGH,
+            )
+            self.stop()
+        else:
+            await self.send_message(
+                f"🚨 Daily loss limit hit (${risk.day_start_equity - risk.equity:.2f}), "
+                f"closing all trades; no new orders until tomorrow",
+                HIGH,
+            )
+        await asyncio.gather(*(other.close_all_trades() for other in self.traders))
+
+    async def get_equity(self) -> float:
+        try:
+            account_info = await self.snapshots.account()
+            return account_info.equity if account_info else 0
+        except Exception as e:
+            logger.error(f"Equity fetch error: {str(e)}")
+            await self.send_message(f"⚠️ Equity fetch error: {str(e)}")
+            return None
+
+    async def handle_config(self, max_trades: str, profit_target: str, max_phases: str):
+        try:
+            max_trades = int(max_trades)
+            profit_target = float(profit_target)
+            max_phases = int(max_phases)
+            if max_trades <= 0:
+                raise ValueError("Max trades must be positive")
+            if profit_target <= 0:
+                raise ValueError("Profit target must be positive")
+            if max_phases <= 0:
+                raise ValueError("Max phases must be positive")
+            for trader in self.traders:
+                trader.configure(max_trades, profit_target, max_phases)
+                trader.record("config", max_trades=max_trades, profit_target=profit_target, max_phases=max_phases)
+            await self.configure_fanout()
+            await self.print_status()
+            await self.send_message("✅ Configuration saved! Send /run to begin trading")
+        except ValueError as e:
+            await self.send_message(f"⚠️ Invalid input: {str(e)}. Example: /config 3 6.2 4")
+
+    async def show_metrics(self):
+        await self.send_message(metrics.summary())
+
+    async def show_accounts(self):
+        if not self.fanout:
+            await self.send_message("No fan-out accounts configured (TRADER_ACCOUNTS)")
+            return
+        lines = [self.fanout.report()]
+        for name, status in (await self.fanout.status()).items():
+            if "error" in status:
+                lines.append(f"• {name}: ⚠️ {status['error']}")
+                continue
+            phases = ", ".join(
+                f"{magic}: phase {state['phase']} ({len(state['trades'])} open{', done' if state['done'] else ''})"
+                for magic, state in status["phases"].items()
+            )
+            lines.append(f"• {name}: equity ${status['equity']:.2f} | {phases}")
+        await self.send_message("\n".join(lines))
+
+    async def profile(self, action: str):
+        if action == "on":
+            profiler.start()
+            await self.send_message("🔬 Sampling profiler started")
+        elif action == "off":
+            profiler.stop()
+            await self.send_message(profiler.report())
+        else:
+            await self.send_message(profiler.report() if profiler.samples else "Usage: /profile on|off|report")
+
+    async def print_status(self):
+        for trader in self.traders:
+            await trader.print_status()
+
+    def status(self) -> dict:
+        # Read-only snapshot for /status and GET /status, built from state the
+        # trading loop already keeps in memory, so polling it adds no broker load
+        risk = self.risk
+        return {
+            "time": time.time(),
+            "running": self.running,
+            "connected": self.connected,
+            "halted": risk.halted(),
+            "balance": risk.balance,
+            "equity": risk.equity,
+            "peak_equity": risk.peak_equity,
+            "instances": [trader.status() for trader in self.traders],
+            "accounts": {
+                account.spec.name: {"fills": account.fills, "rejects": account.rejects}
+                for account in self.fanout.accounts
+            },
+            "notifications": self.notifier.stats(),
+        }
+
+    def status_text(self) -> str:
+        status = self.status()
+        state = "🟢 running" if status["running"] else "⏸️ stopped"
+        if status["halted"]:
+            state += " (daily loss limit, halted)"
+        equity = f"${status['equity']:.2f}" if status["equity"] is not None else "N/A"
+        lines = [f"📊 Status: {state} | Equity: {equity}"]
+        for instance in status["instances"]:
+            price = f"{instance['bid']} / {instance['ask']}" if instance["bid"] is not None else "N/A"
+            lines.append(
+                f"• {instance['instance']}: phase {instance['phase']}/{instance['max_phases'] or '-'}, "
+                f"{instance['trades']}/{instance['max_trades'] or '-'} trades ({instance['volume']:.2f} lots), "
+                f"P&L ${instance['open_pnl']:.2f} open / ${instance['phase_pnl']:.2f} phase, "
+                f"target ${instance['profit_target'] or 0}, trend {instance['trend'] or 'None'}, bid/ask {price}"
+            )
+        return "\n".join(lines)
+
+    async def start_trading(self, traders: Optional[list] = None) -> bool:
+        # Idempotent /run: at most one engine loop, however many /run commands
+        # arrive from either chat or the journal resume. The check and the
+        # task creation happen without an await in between.
+        if self.run_task is not None and not self.run_task.done():
+            await self.send_message(
+                "⚠️ Bot is already running" if self.running else "⚠️ Bot is still stopping, try /run again shortly"
+            )
+            return False
+        if not self.configured:
+            await self.send_message("⚠️ Please configure first with /config")
+            return False
+        self.running = True
+        self.run_task = asyncio.create_task(self.run(traders))
+        return True
+
+    async def run(self, traders: Optional[list] = None):
+        # Runs the given instances, or all of them
+        traders = traders or self.traders
+        if not self.configured:
+            await self.send_message("⚠️ Please configure first with /config")
+            return
+        # A previous run shuts the MT5 session down on exit
+        if not self.connected and not await self.connect_mt5():
+            self.running = False
+            return
+
+        self.running = True
+        await self.send_message("Time to risk it all 😁😁😁😁😢😢😢")
+
+        try:
+            # Each instance runs as its own task; MT5 calls are awaited on the
+            # executor's queue so a slow symbol only delays its own loop.
+            results = await asyncio.gather(*(trader.run() for trader in traders), return_exceptions=True)
+            for trader, result in zip(traders, results):
+                if isinstance(result, Exception):
+                    logger.error(f"[{trader.label}] Strategy task failed: {result}")
         except Exception as e:
             logger.error(f"Critical error: {str(e)}")
             await self.send_message(f"⚠️ Critical error: {str(e)}")
         finally:
-            await asyncio.to_thread(mt5.shutdown)
+            if self.close_on_stop:
+                # Every instance loop has exited, so nothing can open behind
+                # the close, and the session is still up for it
+                self.close_on_stop = False
+                await asyncio.gather(*(trader.close_all_trades() for trader in self.traders), return_exceptions=True)
+            await mt5_call("shutdown")
+            self.connected = False
             await self.send_message("🛑 Trading bot STOPPED")
             self.running = False
 
     def stop(self):
         self.running = False
+        for trader in self.traders:
+            trader.stop()
 
     async def stop_trading(self):
-        if self.running:
+        if not self.running:
+            await self.send_message("⚠️ Bot is not currently running")
+            return
+        if self.run_task is None or self.run_task.done():
             self.stop()
-            await self.close_all_trades()
-            await self.send_message("🛑 Trading stopped via /stop command")
+            await asyncio.gather(*(trader.close_all_trades() for trader in self.traders))
         else:
-            await self.send_message("⚠️ Bot is not currently running")
+            # run() closes the positions once the loops are out, then shuts down
+            self.close_on_stop = True
+            self.stop()
+            await asyncio.gather(self.run_task, return_exceptions=True)
+        await self.send_message("🛑 Trading stopped via /stop command")
 
 async def start_discord(discord_bot):
     await discord_bot.start(os.getenv("DISCORD_TOKEN"))
 
 async def main():
-    # Create a new event loop to avoid deprecation warning
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     # Initialize Discord bot
     intents = discord.Intents.default()
     intents.message_content = True
@@ -382,49 +1041,33 @@ async def main():
 
     # Initialize Telegram bot
     telegram_app = Application.builder().token(os.getenv("TELEGRAM_TOKEN")).build()
-    trader = PhaseTraderPro(discord_bot=discord_bot, telegram_app=telegram_app, telegram_chat_id=os.getenv("TELEGRAM_CHAT_ID"))
+    trader = TradingEngine(
+        discord_bot=discord_bot,
+        telegram_app=telegram_app,
+        telegram_chat_id=os.getenv("TELEGRAM_CHAT_ID"),
+        instances=parse_instances(os.getenv("TRADER_INSTANCES", "XAUUSD:M15")),
+    )
 
     @discord_bot.event
     async def on_ready():
         print("Discord BOT is ready!")
-        await trader.initialize()
 
     @discord_bot.event
     async def on_message(message):
         if message.author == discord_bot.user:
             return
-        content = message.content.lower()
-        if trader.awaiting_input == "config" and content.startswith("/config"):
-            parts = content.split()
-            if len(parts) == 4:
-                await trader.handle_config(parts[1], parts[2], parts[3])
-        elif content == "/run" and trader.max_trades_per_phase:
-            asyncio.create_task(trader.run())
-        elif content == "/stop":
-            await trader.stop_trading()
+        await trader.router.dispatch(message.content)
         await discord_bot.process_commands(message)
 
-    # Telegram handlers
-    async def start(update, context):
-        await trader.send_message("🔥 PHASE TRADER PRO v3.4 🔥\nSend /config max_trades profit_target max_phases to start.")
-        trader.awaiting_input = "config"
+    # Telegram commands go through the same router as Discord messages
+    async def route(update, context):
+        await trader.router.dispatch(update.effective_message.text)
 
-    async def config(update, context):
-        parts = update.message.text.split()
-        if len(parts) == 4:
-            await trader.handle_config(parts[1], parts[2], parts[3])
+    telegram_app.add_handler(CommandHandler(list(trader.router.handlers), route))
 
-    async def run(update, context):
-        if trader.max_trades_per_phase:
-            asyncio.create_task(trader.run())
-
-    async def stop(update, context):
-        await trader.stop_trading()
-
-    telegram_app.add_handler(CommandHandler("start", start))
-    telegram_app.add_handler(CommandHandler("config", config))
-    telegram_app.add_handler(CommandHandler("run", run))
-    telegram_app.add_handler(CommandHandler("stop", stop))
+    if os.getenv("TRADER_METRICS_PORT"):
+        # Also serves GET /status as JSON from memory
+        await start_http_server(port=int(os.getenv("TRADER_METRICS_PORT")), routes=status_routes(trader))
 
     # Start Telegram polling in the same loop
     await telegram_app.initialize()
@@ -432,13 +1075,23 @@ async def main():
     telegram_updater = telegram_app.updater.start_polling(drop_pending_updates=True)
 
     # Start Discord bot in the same loop
-    discord_task = loop.create_task(start_discord(discord_bot))
+    # Tasks go on the running loop; references are kept so they are not
+    # garbage collected mid-flight
+    discord_task = asyncio.create_task(start_discord(discord_bot))
+
+    # Connect and resume from the journal right away rather than after the
+    # Discord login; the Discord sink holds its messages until it is ready
+    init_task = asyncio.create_task(trader.initialize())
 
     try:
         # Keep the loop running
         await asyncio.gather(discord_task, telegram_updater)
     finally:
         # Clean up on shutdown
+        init_task.cancel()
+        await trader.notifier.close()
+        await trader.journal.close()
+        trader.fanout.shutdown()
         await telegram_app.stop()
         await telegram_app.shutdown()
         await discord_bot.close()
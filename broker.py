@@ -0,0 +1,34 @@
+import os
+
+# Every MetaTrader5 call the trading code relies on. Any object exposing
+# these (plus the TIMEFRAME_*, ORDER_TYPE_*, TRADE_* constants) can stand in
+# for the terminal.
+BROKER_CALLS = (
+    "initialize",
+    "login",
+    "shutdown",
+    "last_error",
+    "symbol_select",
+    "symbol_info",
+    "symbol_info_tick",
+    "copy_rates_from_pos",
+    "copy_rates_range",
+    "account_info",
+    "positions_get",
+    "order_send",
+)
+
+
+def load_broker(name=None):
+    name = (name or os.getenv("TRADER_BROKER", "mt5")).lower()
+    if name == "mt5":
+        import MetaTrader5 as broker
+    elif name == "sim":
+        from simulator import SimulatedMT5
+        broker = SimulatedMT5.from_env()
+    else:
+        raise ValueError(f"Unknown broker backend: {name}")
+    missing = [call for call in BROKER_CALLS if not hasattr(broker, call)]
+    if missing:
+        raise ValueError(f"Broker backend {name} is missing: {', '.join(missing)}")
+    return broker
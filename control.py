@@ -0,0 +1,89 @@
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+USAGE = "Commands: /config max_trades profit_target max_phases, /run, /stop, /status, /metrics, /accounts, /profile on|off|report"
+
+
+def parse_command(text: str) -> Optional[Tuple[str, List[str]]]:
+    # "/Run@PhaseBot arg" -> ("run", ["arg"]); None for anything that is not a command
+    parts = (text or "").strip().split()
+    if not parts or not parts[0].startswith("/"):
+        return None
+    name = parts[0][1:].split("@", 1)[0].lower()
+    return name, parts[1:]
+
+
+# Single entry point for Discord and Telegram commands. Both front ends pass
+# the raw message text here, so every command has one implementation and the
+# run/stop transitions are guarded in one place (TradingEngine.start_trading
+# and stop_trading) however many chats send them.
+class CommandRouter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.handlers: Dict[str, Callable[[List[str]], Awaitable]] = {
+            "start": self.start,
+            "config": self.config,
+            "run": self.run,
+            "stop": self.stop,
+            "status": self.status,
+            "metrics": self.metrics,
+            "accounts": self.accounts,
+            "profile": self.profile,
+            "help": self.help,
+        }
+
+    async def dispatch(self, text: str) -> bool:
+        command = parse_command(text)
+        if command is None or command[0] not in self.handlers:
+            return False
+        name, args = command
+        metrics.inc("commands_total", command=name)
+        try:
+            await self.handlers[name](args)
+        except Exception as e:
+            logger.error(f"/{name} failed: {str(e)}")
+            await self.engine.send_message(f"⚠️ /{name} failed: {str(e)}")
+        return True
+
+    async def start(self, args: List[str]):
+        await self.engine.send_message("🔥 PHASE TRADER PRO v3.4 🔥\nSend /config max_trades profit_target max_phases to start.")
+
+    async def config(self, args: List[str]):
+        if self.engine.running:
+            await self.engine.send_message("⚠️ Stop trading with /stop before changing the configuration")
+        elif len(args) == 3:
+            await self.engine.handle_config(*args)
+        else:
+            await self.engine.send_message("Usage: /config max_trades profit_target max_phases\nExample: /config 3 6.2 4")
+
+    async def run(self, args: List[str]):
+        await self.engine.start_trading()
+
+    async def stop(self, args: List[str]):
+        await self.engine.stop_trading()
+
+    async def status(self, args: List[str]):
+        await self.engine.send_message(self.engine.status_text())
+
+    async def metrics(self, args: List[str]):
+        await self.engine.show_metrics()
+
+    async def accounts(self, args: List[str]):
+        await self.engine.show_accounts()
+
+    async def profile(self, args: List[str]):
+        await self.engine.profile(args[0].lower() if args else "report")
+
+    async def help(self, args: List[str]):
+        await self.engine.send_message(USAGE)
+
+
+def status_routes(engine) -> dict:
+    # Extra routes for metrics.start_http_server: GET /status returns the
+    # engine's in-memory status as JSON without touching MT5
+    return {"/status": lambda: ("application/json", json.dumps(engine.status()))}
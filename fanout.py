@@ -0,0 +1,425 @@
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from metrics import Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+REQUOTE_RETRIES = 3
+
+
+@dataclass
+class AccountSpec:
+    name: str
+    login: int = 0
+    password: Optional[str] = None
+    server: Optional[str] = None
+    terminal: Optional[str] = None  # terminal64.exe of this account's own MT5 install
+    base_lot: Optional[float] = None
+    strong_lot: Optional[float] = None
+    lot_scale: float = 1.0  # used for lots not given explicitly
+    deviation: int = 5
+
+
+def load_accounts(path: Optional[str]) -> List[AccountSpec]:
+    # JSON list of AccountSpec fields; "password_env" names an environment
+    # variable holding the password so it need not sit in the file
+    if not path:
+        return []
+    with open(path) as f:
+        raw = json.load(f)
+    accounts = []
+    for spec in raw:
+        spec = dict(spec)
+        password_env = spec.pop("password_env", None)
+        if password_env:
+            spec["password"] = os.getenv(password_env)
+        accounts.append(AccountSpec(**spec))
+    names = [account.name for account in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError("Account names must be unique")
+    return accounts
+
+
+# -- worker process ------------------------------------------------------------
+#
+# The MetaTrader5 package drives one terminal per process, so every follower
+# account gets a process of its own. It owns that account's phase state
+# (trades, target, phase count per instance magic) and only ever sends
+# orders: prices, indicators and signals come from the parent.
+
+class _AccountWorker:
+    def __init__(self, spec: AccountSpec, broker, conn, monitor_interval=1.0):
+        self.spec = spec
+        self.mt5 = broker
+        self.conn = conn
+        self.monitor_interval = monitor_interval
+        self.phases: Dict[int, dict] = {}
+        self.selected = set()
+
+    def tick(self, symbol: str):
+        if symbol not in self.selected and self.mt5.symbol_select(symbol, True):
+            self.selected.add(symbol)
+        return self.mt5.symbol_info_tick(symbol)
+
+    def lots(self, strength: str, params: dict) -> float:
+        base = self.spec.base_lot if self.spec.base_lot is not None else params['base_lot'] * self.spec.lot_scale
+        strong = self.spec.strong_lot if self.spec.strong_lot is not None else params['strong_lot'] * self.spec.lot_scale
+        return round(strong if strength == 'extreme' else base, 2)
+
+    def configure(self, instances: dict):
+        positions = self.mt5.positions_get() or ()
+        for magic, config in instances.items():
+            state = self.phases.get(magic)
+            if state is None:
+                # Pick up positions left open by a previous run of this account
+                mine = [pos for pos in positions if pos.magic == magic]
+                phases = [
+                    int(pos.comment[6:]) for pos in mine
+                    if (pos.comment or "").startswith("PHASE-") and pos.comment[6:].isdigit()
+                ]
+                state = self.phases[magic] = {
+                    'phase': max(phases, default=1), 'trades': [pos.ticket for pos in mine], 'done': False,
+                }
+            # Profit target scales with this account's base lot
+            scale = self.lots('normal', config['params']) / config['params']['base_lot']
+            state.update(config, target=config['profit_target'] * scale)
+        return {'instances': len(self.phases)}
+
+    def open(self, order: dict) -> dict:
+        state = self.phases.get(order['magic'])
+        if state is None or state['done']:
+            return {'ok': False, 'comment': "Instance not configured or finished"}
+        if len(state['trades']) >= state['max_trades']:
+            return {'ok': False, 'comment': "Max trades reached for this phase"}
+        mt5 = self.mt5
+        volume = self.lots(order['strength'], state['params'])
+        buy = order['direction'] == 'bullish'
+        started = time.perf_counter()
+        result = None
+        for attempt in range(REQUOTE_RETRIES):
+            tick = self.tick(order['symbol'])
+            if tick is None:
+                return {'ok': False, 'comment': f"No market tick: {mt5.last_error()}"}
+            price = tick.ask if buy else tick.bid
+            result = mt5.order_send({
+                "action": mt5.TRADE_ACTION_DEAL,
+                "symbol": order['symbol'],
+                "volume": volume,
+                "type": mt5.ORDER_TYPE_BUY if buy else mt5.ORDER_TYPE_SELL,
+                "price": price,
+                "sl": price - order['sl_distance'] if buy else price + order['sl_distance'],
+                "tp": price + order['tp_distance'] if buy else price - order['tp_distance'],
+                "deviation": self.spec.deviation,
+                "magic": order['magic'],
+                "comment": f"PHASE-{state['phase']}",
+            })
+            if result is None or result.retcode not in (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED):
+                break
+        elapsed = time.perf_counter() - started
+        if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+            comment = result.comment if result is not None else str(mt5.last_error())
+            return {'ok': False, 'comment': comment, 'order_seconds': elapsed, 'attempts': attempt + 1}
+        state['trades'].append(result.order)
+        fill = result.price or price
+        point = mt5.symbol_info(order['symbol']).point
+        return {
+            'ok': True, 'ticket': result.order, 'volume': volume, 'price': fill, 'phase': state['phase'],
+            'order_seconds': elapsed, 'attempts': attempt + 1,
+            # Adverse move against the parent's signal price, in points
+            'slippage_points': (fill - order['signal_price']) * (1 if buy else -1) / point,
+        }
+
+    def close(self, magic: int, symbol: Optional[str] = None) -> dict:
+        mt5 = self.mt5
+        # The binding rejects symbol=None, so only filter when a symbol is given
+        positions = mt5.positions_get(symbol=symbol) if symbol else mt5.positions_get()
+        if positions is None:
+            # A failed read is not "nothing to close"; keep the tracked tickets
+            return {'closed': 0, 'failed': 0, 'error': str(mt5.last_error())}
+        positions = [pos for pos in positions if pos.magic == magic]
+        closed, failed = [], []
+        for pos in positions:
+            result = None
+            for _ in range(REQUOTE_RETRIES):
+                tick = self.tick(pos.symbol)
+                if tick is None:
+                    break
+                buy = pos.type == mt5.ORDER_TYPE_BUY
+                result = mt5.order_send({
+                    "action": mt5.TRADE_ACTION_DEAL,
+                    "symbol": pos.symbol,
+                    "volume": pos.volume,
+                    "type": mt5.ORDER_TYPE_SELL if buy else mt5.ORDER_TYPE_BUY,
+                    "position": pos.ticket,
+                    "price": tick.bid if buy else tick.ask,
+                    "deviation": self.spec.deviation,
+                    "magic": magic,
+                    "comment": "PHASE-END",
+                })
+                if result is None or result.retcode not in (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED):
+                    break
+            (closed if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE else failed).append(pos.ticket)
+        state = self.phases.get(magic)
+        if state is not None:
+            state['trades'] = [ticket for ticket in state['trades'] if ticket in failed]
+        return {'closed': len(closed), 'failed': len(failed)}
+
+    def monitor(self):
+        # Phase bookkeeping for this account only: drop tickets closed by
+        # TP/SL and complete the phase once its own target is reached
+        if not any(state['trades'] for state in self.phases.values()):
+            return
+        positions = self.mt5.positions_get()
+        if positions is None:
+            return  # read failed; dropping every ticket would lose track of them
+        for magic, state in self.phases.items():
+            if state['done'] or not state['trades']:
+                continue
+            mine = [pos for pos in positions if pos.magic == magic]
+            open_tickets = {pos.ticket for pos in mine}
+            state['trades'] = [ticket for ticket in state['trades'] if ticket in open_tickets]
+            profit = sum(pos.profit for pos in mine)
+            if mine and profit >= state['target']:
+                self.close(magic)
+                self.event(f"🎯 PHASE {state['phase']} COMPLETED (magic {magic}) Profit: ${profit:.2f}")
+                state['trades'] = []
+                if state['phase'] >= state['max_phases']:
+                    state['done'] = True
+                    self.event(f"🏁 Max phases ({state['max_phases']}) reached for magic {magic}")
+                else:
+                    state['phase'] += 1
+
+    def status(self) -> dict:
+        account = self.mt5.account_info()
+        return {
+            'balance': account.balance if account else None,
+            'equity': account.equity if account else None,
+            'phases': {magic: {k: state[k] for k in ('phase', 'trades', 'done')} for magic, state in self.phases.items()},
+        }
+
+    def event(self, text: str):
+        self.conn.send(('event', None, text))
+
+    def run(self):
+        handlers = {'configure': self.configure, 'open': self.open, 'close': self.close, 'status': self.status}
+        while True:
+            if self.conn.poll(self.monitor_interval):
+                kind, request_id, args = self.conn.recv()
+                if kind == 'stop':
+                    break
+                try:
+                    self.conn.send(('result', request_id, handlers[kind](*args)))
+                except Exception as e:
+                    self.conn.send(('error', request_id, f"{type(e).__name__}: {e}"))
+            try:
+                self.monitor()
+            except Exception as e:
+                self.event(f"⚠️ Monitor error: {e}")
+
+
+def _worker_main(spec: AccountSpec, conn):
+    from broker import load_broker
+
+    broker = load_broker()
+    kwargs = {'path': spec.terminal} if spec.terminal else {}
+    if not broker.initialize(**kwargs):
+        conn.send(('error', 0, f"initialize() failed: {broker.last_error()}"))
+        return
+    if not broker.login(login=int(spec.login), password=spec.password, server=spec.server):
+        conn.send(('error', 0, f"login failed: {broker.last_error()}"))
+        return
+    conn.send(('result', 0, {'login': spec.login}))
+    try:
+        _AccountWorker(spec, broker, conn).run()
+    finally:
+        broker.shutdown()
+
+
+# -- parent side -------------------------------------------------------------
+
+class AccountProxy:
+    def __init__(self, spec: AccountSpec, context):
+        self.spec = spec
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(spec, child), name=f"account-{spec.name}", daemon=True)
+        self.ids = itertools.count(1)
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.loop = None
+        self.on_event = None
+        self.latency = Histogram()
+        self.fills = 0
+        self.rejects = 0
+        self.slippage_sum = 0.0
+        self.slippage_max = 0.0
+
+    async def start(self, on_event, timeout=30.0):
+        self.loop = asyncio.get_running_loop()
+        self.on_event = on_event
+        ready = self.loop.create_future()
+        self.pending[0] = ready
+        self.process.start()
+        threading.Thread(target=self._reader, name=f"account-{self.spec.name}-reader", daemon=True).start()
+        await asyncio.wait_for(ready, timeout)
+
+    def _reader(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            self.loop.call_soon_threadsafe(self._dispatch, *message)
+        self.loop.call_soon_threadsafe(self._fail_pending, "worker exited")
+
+    def _dispatch(self, kind, request_id, payload):
+        if kind == 'event':
+            self.on_event(self, payload)
+            return
+        future = self.pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if kind == 'error':
+            future.set_exception(RuntimeError(payload))
+        else:
+            future.set_result(payload)
+
+    def _fail_pending(self, reason: str):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.spec.name}: {reason}"))
+        self.pending.clear()
+
+    async def request(self, kind: str, *args, timeout=15.0):
+        request_id = next(self.ids)
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        self.conn.send((kind, request_id, args))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    def stop(self, timeout=5.0):
+        if self.process.is_alive():
+            try:
+                self.conn.send(('stop', 0, ()))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+# Mirrors the primary account's trade decisions onto follower accounts. The
+# parent computes data, indicators and signals once; each order is sent to
+# every follower concurrently and each follower sizes it from its own lots.
+class FanOut:
+    def __init__(self, accounts: List[AccountSpec], notify=None):
+        context = multiprocessing.get_context("spawn")
+        self.accounts = [AccountProxy(spec, context) for spec in accounts]
+        self.notify = notify
+        self.started = False
+        self.tasks = set()
+
+    def __bool__(self):
+        return bool(self.accounts)
+
+    async def start(self):
+        if self.started or not self.accounts:
+            return
+        results = await asyncio.gather(
+            *(account.start(self._event) for account in self.accounts), return_exceptions=True
+        )
+        for account, result in zip(self.accounts, results):
+            if isinstance(result, Exception):
+                logger.error(f"Account {account.spec.name} failed to start: {result}")
+        self.accounts = [account for account, result in zip(self.accounts, results) if not isinstance(result, Exception)]
+        self.started = True
+
+    def _event(self, account: AccountProxy, text: str):
+        if self.notify:
+            self.notify(f"[{account.spec.name}] {text}")
+
+    async def _broadcast(self, kind: str, *args) -> list:
+        await self.start()
+        return await asyncio.gather(*(account.request(kind, *args) for account in self.accounts), return_exceptions=True)
+
+    async def configure(self, instances: dict):
+        # instances: magic -> {max_trades, profit_target, max_phases, params}
+        for account, result in zip(self.accounts, await self._broadcast('configure', instances)):
+            if isinstance(result, Exception):
+                logger.error(f"Account {account.spec.name} configure failed: {result}")
+
+    async def open(self, symbol: str, magic: int, direction: str, strength: str, signal_price: float,
+                   tp_distance: float, sl_distance: float) -> list:
+        order = {
+            'symbol': symbol, 'magic': magic, 'direction': direction, 'strength': strength,
+            'signal_price': signal_price, 'tp_distance': tp_distance, 'sl_distance': sl_distance,
+        }
+        started = time.perf_counter()
+        await self.start()
+        requests = [self._open(account, order, started) for account in self.accounts]
+        return await asyncio.gather(*requests)
+
+    async def _open(self, account: AccountProxy, order: dict, started: float) -> dict:
+        try:
+            result = await account.request('open', order)
+        except Exception as e:
+            result = {'ok': False, 'comment': str(e)}
+        elapsed = time.perf_counter() - started
+        name = account.spec.name
+        if result.get('ok'):
+            account.fills += 1
+            account.latency.observe(elapsed)
+            account.slippage_sum += result['slippage_points']
+            account.slippage_max = max(account.slippage_max, result['slippage_points'])
+            metrics.observe("fanout_fill_seconds", elapsed, account=name)
+            metrics.inc("fanout_orders_total", account=name, result="done")
+        else:
+            account.rejects += 1
+            metrics.inc("fanout_orders_total", account=name, result="failed")
+            logger.info(f"[{name}] Fan-out order not filled: {result.get('comment')}")
+        return {'account': name, 'seconds': elapsed, **result}
+
+    async def close(self, magic: int, symbol: Optional[str] = None):
+        for account, result in zip(self.accounts, await self._broadcast('close', magic, symbol)):
+            if isinstance(result, Exception) or result.get('failed') or result.get('error'):
+                logger.error(f"[{account.spec.name}] Fan-out close incomplete: {result}")
+                self._event(account, f"⚠️ Close incomplete: {result}")
+
+    async def status(self) -> Dict[str, dict]:
+        results = await self._broadcast('status')
+        return {
+            account.spec.name: ({'error': str(result)} if isinstance(result, Exception) else result)
+            for account, result in zip(self.accounts, results)
+        }
+
+    def report(self) -> str:
+        lines = ["📡 Fan-out accounts (fills / rejects, latency p50 / p95, slippage mean / max)"]
+        for account in self.accounts:
+            mean = account.slippage_sum / account.fills if account.fills else 0.0
+            lines.append(
+                f"• {account.spec.name}: {account.fills} / {account.rejects}, "
+                f"{account.latency.quantile(0.5) * 1000:.0f} / {account.latency.quantile(0.95) * 1000:.0f} ms, "
+                f"{mean:.1f} / {account.slippage_max:.1f} pts"
+            )
+        return "\n".join(lines)
+
+    def submit(self, coroutine):
+        # Fire-and-forget so the primary account's own order is never delayed
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def shutdown(self):
+        for account in self.accounts:
+            account.stop()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    instance TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_instance ON events (instance, id);
+"""
+
+
+@dataclass
+class InstanceState:
+    max_trades: Optional[int] = None
+    profit_target: Optional[float] = None
+    max_phases: Optional[int] = None
+    current_phase: int = 1
+    current_trend: Optional[str] = None
+    active_trades: List[int] = field(default_factory=list)
+    running: bool = False
+
+    @property
+    def configured(self) -> bool:
+        return None not in (self.max_trades, self.profit_target, self.max_phases)
+
+    def apply(self, kind: str, data: dict):
+        if kind == "checkpoint":
+            self.__init__(**data)
+        elif kind == "config":
+            self.max_trades = data["max_trades"]
+            self.profit_target = data["profit_target"]
+            self.max_phases = data["max_phases"]
+        elif kind == "run":
+            self.running = True
+        elif kind == "stop":
+            self.running = False
+        elif kind == "trend":
+            self.current_trend = data["trend"]
+        elif kind == "order":
+            self.active_trades.append(data["ticket"])
+        elif kind == "close":
+            closed = set(data["tickets"])
+            self.active_trades = [ticket for ticket in self.active_trades if ticket not in closed]
+        elif kind == "phase":
+            self.current_phase = data["phase"]
+
+
+# Append-only event log of everything the in-memory traders would otherwise
+# lose on a restart: config, run/stop, trend, orders, closes and phase
+# transitions. Events are buffered and written by a background task in one
+# transaction per batch, so the tick path never waits on the disk and the
+# journal costs one fsync per batch rather than one per event. Anything lost
+# in the last unflushed batch is recovered by reconciling against the broker.
+class TradeJournal:
+    def __init__(self, path="trader_journal.db", flush_interval=0.2, batch_size=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()  # guards `pending`; held only for the swap
+        self.write_lock = threading.Lock()
+        self.wakeup = None
+        self.task = None
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+
+    def record(self, instance: str, kind: str, **data):
+        event = (time.time(), instance, kind, json.dumps(data))
+        with self.lock:
+            self.pending.append(event)
+        self._start()
+        if self.wakeup is not None and len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def _start(self):
+        if self.task is not None and not self.task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet: flushed on the next start or on close()
+        self.wakeup = asyncio.Event()
+        self.task = loop.create_task(self._flusher())
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if self.pending:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"Journal flush failed: {e}")
+
+    def flush(self) -> int:
+        with self.write_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                self.db.execute("BEGIN")
+                self.db.executemany("INSERT INTO events (ts, instance, kind, data) VALUES (?, ?, ?, ?)", batch)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                with self.lock:
+                    self.pending[:0] = batch
+                raise
+            metrics.observe("journal_flush_seconds", time.perf_counter() - started)
+            metrics.inc("journal_events_total", len(batch))
+            return len(batch)
+
+    def replay(self, instances=None) -> Dict[str, InstanceState]:
+        # Each instance is folded from its latest checkpoint onwards
+        started = time.perf_counter()
+        self.flush()
+        if instances is None:
+            instances = [row[0] for row in self.db.execute("SELECT DISTINCT instance FROM events")]
+        states = {}
+        for instance in instances:
+            row = self.db.execute(
+                "SELECT max(id) FROM events WHERE instance = ? AND kind = 'checkpoint'", (instance,)
+            ).fetchone()
+            events = self.db.execute(
+                "SELECT kind, data FROM events WHERE instance = ? AND id >= ? ORDER BY id", (instance, row[0] or 0)
+            ).fetchall()
+            if not events:
+                continue
+            state = InstanceState()
+            for kind, data in events:
+                state.apply(kind, json.loads(data))
+            states[instance] = state
+        logger.info(f"Replayed journal for {len(states)} instances in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return states
+
+    def checkpoint(self, instance: str, state: InstanceState):
+        self.record(instance, "checkpoint", **asdict(state))
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.to_thread(self.flush)
+        self.db.close()
@@ -0,0 +1,195 @@
+import copy
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from strategy import StrategyParams
+
+NAN = float('nan')
+
+RATE_FIELDS = ('time', 'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume')
+# Record layout of copy_rates_* results
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+INDICATOR_FIELDS = ('ema', 'rsi', 'atr', 'momentum')
+COLUMNS = RATE_FIELDS + INDICATOR_FIELDS
+
+
+# Streaming equivalents of the `ta` indicators used by get_market_data. Each
+# update is O(1) and reproduces ta's seeding rules, so a series fed bar by bar
+# gives the same values as ta over the same bars.
+class EMAState:
+    def __init__(self, window: int):
+        self.window = window
+        self.alpha = 2 / (window + 1)
+        self.value = None
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value if self.count >= self.window else NAN
+
+
+class RSIState:
+    def __init__(self, window: int):
+        self.window = window
+        self.alpha = 1 / window
+        self.prev_close = None
+        self.avg_up = 0.0
+        self.avg_down = 0.0
+        self.count = 0
+
+    def update(self, close: float) -> float:
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        if self.count == 0:
+            self.avg_up, self.avg_down = up, down
+        else:
+            self.avg_up = self.alpha * up + (1 - self.alpha) * self.avg_up
+            self.avg_down = self.alpha * down + (1 - self.alpha) * self.avg_down
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            return NAN
+        if self.avg_down == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.avg_up / self.avg_down)
+
+
+class ATRState:
+    def __init__(self, window: int):
+        self.window = window
+        self.prev_close = None
+        self.tr_sum = 0.0
+        self.value = 0.0
+        self.count = 0
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            self.tr_sum += tr
+            return 0.0
+        if self.count == self.window:
+            self.value = (self.tr_sum + tr) / self.window
+        else:
+            self.value = (self.value * (self.window - 1) + tr) / self.window
+        return self.value
+
+
+class IndicatorState:
+    def __init__(self, ema_window=21, rsi_window=14, atr_window=14, momentum_period=3):
+        self.ema = EMAState(ema_window)
+        self.rsi = RSIState(rsi_window)
+        self.atr = ATRState(atr_window)
+        self.closes = deque(maxlen=momentum_period + 1)
+
+    def update(self, high: float, low: float, close: float) -> tuple:
+        self.closes.append(close)
+        if len(self.closes) == self.closes.maxlen and self.closes[0] != 0:
+            momentum = close / self.closes[0] - 1
+        else:
+            momentum = NAN
+        return (
+            self.ema.update(close),
+            self.rsi.update(close),
+            self.atr.update(high, low, close),
+            momentum,
+        )
+
+
+# Per-symbol, per-timeframe bar cache. Closed bars are folded into the
+# indicator state once; the still-forming last bar is evaluated on a copy so
+# it can be revised on every refresh without disturbing the committed state.
+class BarCache:
+    def __init__(self, symbol: str, timeframe: int, period_seconds: int, history=100, min_refresh=1.0, params=None):
+        self.params = params or StrategyParams()
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.period_seconds = period_seconds
+        self.history = history
+        self.min_refresh = min_refresh
+        self.reset()
+
+    def reset(self):
+        self.state = IndicatorState(
+            self.params.ema_window, self.params.rsi_window, self.params.atr_window, self.params.momentum_period
+        )
+        self.closed = deque(maxlen=self.history)
+        self.forming = None
+        self.last_fetch = 0.0
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+
+    @property
+    def empty(self) -> bool:
+        return self.forming is None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return not self.empty and now - self.last_fetch < self.min_refresh
+
+    def fetch_count(self, now: Optional[float] = None) -> int:
+        if self.empty:
+            return self.history
+        now = time.monotonic() if now is None else now
+        elapsed_bars = int((now - self.last_fetch) // self.period_seconds)
+        return min(self.history, elapsed_bars + 2)
+
+    def _row(self, bar, indicators) -> tuple:
+        return tuple(bar[field].item() for field in RATE_FIELDS) + indicators
+
+    def _commit(self, bar):
+        indicators = self.state.update(float(bar['high']), float(bar['low']), float(bar['close']))
+        self.closed.append(self._row(bar, indicators))
+
+    def _set_forming(self, bar):
+        preview = copy.deepcopy(self.state)
+        indicators = preview.update(float(bar['high']), float(bar['low']), float(bar['close']))
+        self.forming = self._row(bar, indicators)
+
+    def apply(self, rates, now: Optional[float] = None) -> bool:
+        # Returns False when the fetched window does not overlap the cache, in
+        # which case the caller should reset() and fetch a full history.
+        if rates is None or len(rates) == 0:
+            return False
+        if not self.empty:
+            forming_time = self.forming[0]
+            if rates[0]['time'] > forming_time:
+                return False
+            rates = rates[rates['time'] >= forming_time]
+        if len(rates) == 0:
+            return False
+        for bar in rates[:-1]:
+            self._commit(bar)
+        self._set_forming(rates[-1])
+        self.last_fetch = time.monotonic() if now is None else now
+        self.version += 1
+        return True
+
+    @property
+    def last(self) -> Optional[dict]:
+        if self.empty:
+            return None
+        return dict(zip(COLUMNS, self.forming))
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame_version != self.version:
+            df = pd.DataFrame.from_records(list(self.closed) + [self.forming], columns=COLUMNS)
+            df['time'] = pd.to_datetime(df['time'], unit='s', errors='coerce')
+            self._frame = df.dropna()
+            self._frame_version = self.version
+        return self._frame
+
@@ -0,0 +1,231 @@
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+from collections import Counter as FrameCounter
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+# Process-wide counters and latency histograms, keyed by metric name and a
+# sorted label tuple. Updates are plain dict/int operations so they are cheap
+# enough for the tick path; the lock only guards series creation.
+class Registry:
+    def __init__(self):
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self.help: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def render(self) -> str:
+        # Prometheus text exposition format
+        lines = []
+        for name in sorted({key[0] for key in self.counters}):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for (series, labels), value in sorted(self.counters.items()):
+                if series == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        for name in sorted({key[0] for key in self.histograms}):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for (series, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bucket, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bucket),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, limit=25) -> str:
+        # Compact p50/p95 view for the /metrics chat command
+        lines = ["📈 Metrics (p50 / p95 / count)"]
+        ranked = sorted(self.histograms.items(), key=lambda item: -item[1].sum)[:limit]
+        for (name, labels), histogram in ranked:
+            label = ",".join(str(value) for _, value in labels)
+            lines.append(
+                f"• {name.replace('_seconds', '')}[{label}]: {histogram.quantile(0.5) * 1000:.1f} / "
+                f"{histogram.quantile(0.95) * 1000:.1f} ms / {histogram.count}"
+            )
+        for (name, labels), value in sorted(self.counters.items()):
+            label = ",".join(str(value) for _, value in labels)
+            lines.append(f"• {name}[{label}]: {value:g}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+metrics = Registry()
+metrics.describe("mt5_call_seconds", "Latency of broker calls including the worker thread hop")
+metrics.describe("loop_stage_seconds", "Latency of trading loop stages")
+metrics.describe("notification_send_seconds", "Latency of one delivery attempt per notification sink")
+metrics.describe("loop_sleep_seconds", "Time the trading loop spends sleeping between ticks")
+
+
+async def start_http_server(host="127.0.0.1", port=9108, registry: Registry = metrics, routes=None):
+    # Minimal HTTP/1.0 responder: GET /metrics serves the registry, any extra
+    # path in `routes` maps to a zero-argument callable returning
+    # (content_type, body).
+    routes = dict(routes or {})
+    routes.setdefault("/metrics", lambda: ("text/plain; version=0.0.4", registry.render()))
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) >= 2 else "/"
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            if path in routes:
+                content_type, body = routes[path]()
+                status = "200 OK"
+            else:
+                content_type, body, status = "text/plain", "not found\n", "404 Not Found"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Metrics endpoint error: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+
+# Statistical profiler for the event loop thread: a daemon thread samples the
+# target thread's Python stack every `interval` seconds and counts frames, so
+# it can be switched on in production without instrumenting any code.
+class SamplingProfiler:
+    def __init__(self, interval=0.005, depth=8):
+        self.interval = interval
+        self.depth = depth
+        self.thread_id = None
+        self.samples = 0
+        self.stacks = FrameCounter()
+        self.leaves = FrameCounter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: Optional[int] = None):
+        if self.running:
+            return
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = 0
+        self.stacks.clear()
+        self.leaves.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples += 1
+            self.leaves[stack[0]] += 1
+            self.stacks[" <- ".join(stack)] += 1
+
+    def report(self, limit=10) -> str:
+        if not self.samples:
+            return "No profiler samples collected"
+        lines = [f"🔬 Profile: {self.samples} samples every {self.interval * 1000:.0f} ms"]
+        for frame, count in self.leaves.most_common(limit):
+            lines.append(f"• {count / self.samples:6.1%} {frame}")
+        return "\n".join(lines)
+
+
+profiler = SamplingProfiler()
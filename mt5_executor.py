@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Dict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_TRADE = 0
+PRIORITY_TICK = 1
+PRIORITY_DATA = 2
+PRIORITY_POLL = 3
+
+DEFAULT_PRIORITIES = {
+    "order_send": PRIORITY_TRADE,
+    "symbol_info_tick": PRIORITY_TICK,
+    "positions_get": PRIORITY_TICK,
+    "copy_rates_from_pos": PRIORITY_DATA,
+    "copy_rates_range": PRIORITY_DATA,
+    "symbol_info": PRIORITY_DATA,
+    "account_info": PRIORITY_POLL,
+}
+
+# Read-only calls whose identical concurrent requests can share one result
+COALESCED_CALLS = frozenset({
+    "positions_get", "account_info", "symbol_info_tick", "symbol_info", "copy_rates_from_pos", "copy_rates_range",
+})
+
+_STOP = object()
+
+
+# Single owner of the terminal connection. All broker calls run on one pinned
+# worker thread, taken from a priority queue so orders and closes jump ahead
+# of polling; identical reads already queued or running are answered by the
+# same call. Awaiting a call never blocks the event loop.
+class MT5Executor:
+    def __init__(self, broker, name="mt5-io"):
+        self.broker = broker
+        self.name = name
+        self.requests = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.inflight: Dict[tuple, asyncio.Future] = {}
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout=5.0):
+        if self.thread is not None and self.thread.is_alive():
+            self.requests.put((-1, next(self.sequence), _STOP))
+            self.thread.join(timeout)
+
+    async def call(self, name: str, *args, _priority=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        key = None
+        if name in COALESCED_CALLS:
+            key = (name, args, tuple(sorted(kwargs.items())))
+            pending = self.inflight.get(key)
+            if pending is not None and not pending.done():
+                metrics.inc("mt5_coalesced_total", call=name)
+                return await asyncio.shield(pending)
+
+        self.start()
+        future = loop.create_future()
+        if key is not None:
+            self.inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._forget(key, future))
+        priority = DEFAULT_PRIORITIES.get(name, PRIORITY_DATA) if _priority is None else _priority
+        self.requests.put((priority, next(self.sequence), (name, args, kwargs, future, loop, time.perf_counter())))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+
+    def _worker(self):
+        while True:
+            _, _, item = self.requests.get()
+            if item is _STOP:
+                return
+            name, args, kwargs, future, loop, queued = item
+            metrics.observe("mt5_queue_seconds", time.perf_counter() - queued, call=name)
+            try:
+                result, error = getattr(self.broker, name)(*args, **kwargs), None
+            except BaseException as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, result, error)
+            except RuntimeError:
+                logger.warning(f"Dropped {name} result: event loop closed")
+
+    @staticmethod
+    def _resolve(future, result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def pending(self) -> int:
+        return self.requests.qsize()
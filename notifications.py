@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LOW = 0
+NORMAL = 1
+HIGH = 2
+
+
+class Sink:
+    name = "sink"
+    max_length = 4000
+    min_interval = 0.0  # seconds between two sends on this sink
+    coalesce_window = 0.0
+    retries = 1
+    retry_delay = 2
+
+    async def send(self, text: str):
+        raise NotImplementedError
+
+
+class LogSink(Sink):
+    name = "log"
+    max_length = 100000
+
+    async def send(self, text: str):
+        logger.info(text)
+
+
+class DiscordSink(Sink):
+    name = "discord"
+    max_length = 2000
+    min_interval = 1.0  # Discord allows 5 messages per 5 s per channel
+    coalesce_window = 1.0
+    retries = 3
+    ready_timeout = 60
+
+    def __init__(self, discord_bot, channel_name="bot-test"):
+        self.discord_bot = discord_bot
+        self.channel_name = channel_name
+        self.channel = None
+
+    def resolve_channel(self):
+        if self.channel is None:
+            for channel in self.discord_bot.get_all_channels():
+                if channel.name == self.channel_name:
+                    self.channel = channel
+                    break
+        return self.channel
+
+    async def send(self, text: str):
+        # Messages published before the Discord login completes wait here
+        deadline = time.monotonic() + self.ready_timeout
+        while not self.discord_bot.is_ready():
+            if time.monotonic() > deadline:
+                raise RuntimeError("Discord bot is not ready")
+            await asyncio.sleep(0.5)
+        channel = self.resolve_channel()
+        if channel is None:
+            raise RuntimeError(f"Discord channel #{self.channel_name} not found")
+        try:
+            await channel.send(text)
+        except Exception:
+            # The cached channel may be stale (deleted, permissions changed)
+            self.channel = None
+            raise
+
+
+class TelegramSink(Sink):
+    name = "telegram"
+    max_length = 4096
+    min_interval = 1.0  # Telegram allows about one message per second per chat
+    coalesce_window = 1.0
+    retries = 3
+
+    def __init__(self, telegram_app, chat_id):
+        self.telegram_app = telegram_app
+        self.chat_id = chat_id
+
+    async def send(self, text: str):
+        await self.telegram_app.bot.send_message(chat_id=self.chat_id, text=text)
+
+
+class SinkWorker:
+    def __init__(self, sink: Sink, maxsize=200):
+        self.sink = sink
+        self.maxsize = maxsize
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.inflight = False
+        self.last_send = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def put(self, text: str, priority: int):
+        if len(self.queue) >= self.maxsize and not self._evict(priority):
+            self.dropped += 1
+            metrics.inc("notifications_dropped_total", sink=self.sink.name, priority=priority)
+            return
+        self.queue.append((priority, text))
+        self.wakeup.set()
+
+    def _evict(self, priority: int) -> bool:
+        # Make room by dropping the oldest message of the lowest priority that
+        # is below the incoming one; refuse when everything queued outranks it.
+        for level in range(LOW, priority):
+            for item in self.queue:
+                if item[0] == level:
+                    self.queue.remove(item)
+                    self.dropped += 1
+                    metrics.inc("notifications_dropped_total", sink=self.sink.name, priority=level)
+                    return True
+        return False
+
+    def _take_batch(self) -> str:
+        parts = []
+        length = 0
+        while self.queue:
+            text = self.queue[0][1]
+            if len(text) > self.sink.max_length:
+                text = text[:self.sink.max_length - 3] + "..."
+            added = len(text) + (1 if parts else 0)
+            if parts and length + added > self.sink.max_length:
+                break
+            self.queue.popleft()
+            parts.append(text)
+            length += added
+        return "\n".join(parts)
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            if self.sink.coalesce_window:
+                await asyncio.sleep(self.sink.coalesce_window)
+            while self.queue:
+                wait = self.last_send + self.sink.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.inflight = True
+                try:
+                    await self._deliver(self._take_batch())
+                finally:
+                    self.inflight = False
+            self.wakeup.clear()
+
+    async def _deliver(self, text: str):
+        for attempt in range(self.sink.retries):
+            started = time.perf_counter()
+            try:
+                await self.sink.send(text)
+                self.sent += 1
+                return
+            except Exception as e:
+                logger.error(f"{self.sink.name} send error (attempt {attempt + 1}/{self.sink.retries}): {e}")
+                if attempt < self.sink.retries - 1:
+                    metrics.inc("notification_retries_total", sink=self.sink.name)
+                    await asyncio.sleep(self.sink.retry_delay)
+            finally:
+                self.last_send = time.monotonic()
+                metrics.observe("notification_send_seconds", time.perf_counter() - started, sink=self.sink.name)
+        self.failed += 1
+        metrics.inc("notification_failures_total", sink=self.sink.name)
+        logger.error(f"Failed to send {self.sink.name} message after retries")
+
+
+# Fan-out of outbound chat messages. publish() only appends to in-memory
+# queues; delivery, coalescing, rate limiting and retries all happen in one
+# background task per sink, so callers never wait on chat I/O.
+class NotificationDispatcher:
+    def __init__(self, sinks: Optional[List[Sink]] = None, maxsize=200):
+        self.workers = [SinkWorker(sink, maxsize=maxsize) for sink in (sinks or [LogSink()])]
+
+    def start(self):
+        for worker in self.workers:
+            if worker.task is None or worker.task.done():
+                worker.task = asyncio.get_running_loop().create_task(worker.run())
+
+    def publish(self, text: str, priority=NORMAL):
+        try:
+            self.start()
+        except RuntimeError:
+            pass  # No running loop yet; workers start on the next publish
+        for worker in self.workers:
+            worker.put(text, priority)
+
+    async def flush(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while any(worker.queue or worker.inflight for worker in self.workers) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def close(self, timeout=10.0):
+        await self.flush(timeout)
+        for worker in self.workers:
+            if worker.task is not None:
+                worker.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            worker.sink.name: {
+                "queued": len(worker.queue),
+                "sent": worker.sent,
+                "dropped": worker.dropped,
+                "failed": worker.failed,
+            }
+            for worker in self.workers
+        }
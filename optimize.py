@@ -0,0 +1,289 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest import BacktestConfig, load_bars, run_backtest
+from signals import PHASE_STRATEGY, SignalEngine, SignalStrategy, load_strategies
+from strategy import StrategyParams, compute_indicators
+
+logger = logging.getLogger(__name__)
+
+WINDOW_FIELDS = ('ema_window', 'rsi_window', 'atr_window', 'momentum_period')
+PARAM_FIELDS = {f.name for f in fields(StrategyParams)}
+CONFIG_FIELDS = {f.name for f in fields(BacktestConfig)}
+BAR_FIELDS = ('time', 'open', 'high', 'low', 'close', 'spread')
+INDICATOR_NAMES = ('ema', 'rsi', 'atr', 'momentum')
+RANKINGS = {
+    'profit_factor': False,  # descending
+    'net_profit': False,
+    'win_rate': False,
+    'max_drawdown': True,  # ascending
+    'max_drawdown_pct': True,
+}
+PROFIT_FACTOR_CAP = 100.0  # a set with no losing trades ranks as this, not inf
+
+DEFAULT_SPACE = {
+    'base_lot': [0.01, 0.02],
+    'strong_lot': [0.02, 0.04],
+    'strong_move_threshold': [1.2, 1.8, 2.4],
+    'ema_window': [14, 21, 34],
+    'rsi_window': [14],
+    'atr_window': [14],
+    'rsi_buy': [55, 60],
+    'rsi_sell': [40, 45],
+    'tp_atr': [2.0, 3.0],
+    'sl_atr': [1.0, 1.5],
+    'max_trades_per_phase': [2, 3],
+    'profit_target_per_phase': [4.0, 6.2],
+    'max_phases': [None],
+}
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    ranges = [name for name, values in space.items() if isinstance(values, tuple)]
+    if ranges:
+        raise ValueError(f"Ranges need random search: {', '.join(ranges)}")
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_samples(space: Dict[str, object], count: int, seed: Optional[int] = None) -> List[dict]:
+    # Lists are sampled as choices, (low, high) tuples uniformly (ints stay ints)
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        combo = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                combo[name] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                combo[name] = rng.choice(values)
+        samples.append(combo)
+    return samples
+
+
+def window_key(combo: dict, defaults: Optional[StrategyParams] = None) -> Tuple[int, ...]:
+    defaults = defaults or StrategyParams()
+    return tuple(int(combo.get(name, getattr(defaults, name))) for name in WINDOW_FIELDS)
+
+
+def split_combo(combo: dict, base_config: BacktestConfig,
+                base_params: Optional[StrategyParams] = None) -> Tuple[StrategyParams, BacktestConfig]:
+    unknown = set(combo) - PARAM_FIELDS - CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    params = replace(base_params or StrategyParams(), **{k: v for k, v in combo.items() if k in PARAM_FIELDS})
+    config = replace(base_config, **{k: v for k, v in combo.items() if k in CONFIG_FIELDS})
+    return params, config
+
+
+# Bars and every distinct indicator set live in shared memory blocks created
+# by the parent. Workers map them as NumPy views, so indicator series are
+# computed once per window setting rather than once per combination.
+class SharedArrays:
+    def __init__(self):
+        self.blocks = {}
+        self.layout = {}
+
+    def put(self, name: str, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self.blocks[name] = block
+        self.layout[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+_worker = {}
+
+
+def _open_block(name: str) -> shared_memory.SharedMemory:
+    # Workers attach untracked: only the parent, which created the blocks,
+    # unlinks them. A tracked attach would have the worker's resource tracker
+    # warn about (and possibly unlink) blocks still in use (bpo-39959).
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach(layout: dict, base_config: BacktestConfig, strategy: SignalStrategy):
+    blocks = {name: _open_block(spec[0]) for name, spec in layout.items()}
+    arrays = {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+        for name, (_, shape, dtype) in layout.items()
+    }
+    _worker.update(blocks=blocks, arrays=arrays, base_config=base_config, strategy=strategy)
+    _worker['bars'] = pd.DataFrame({field: arrays[f"bars/{field}"] for field in BAR_FIELDS}, copy=False)
+
+
+def _evaluate(task) -> dict:
+    index, combo, start, end = task
+    arrays = _worker['arrays']
+    strategy = _worker['strategy']
+    params, config = split_combo(combo, _worker['base_config'], strategy.params)
+    key = "/".join(str(value) for value in window_key(combo, strategy.params))
+    indicators = {name: arrays[f"ind/{key}/{name}"][start:end] for name in INDICATOR_NAMES}
+    result = run_backtest(_worker['bars'].iloc[start:end], params, config, indicators, strategy)
+    return {'index': index, **combo, **result.stats}
+
+
+class Optimizer:
+    def __init__(self, bars: pd.DataFrame, base_config: Optional[BacktestConfig] = None,
+                 workers: Optional[int] = None, rank_by='profit_factor', min_trades=10,
+                 strategy: Optional[SignalStrategy] = None):
+        if rank_by not in RANKINGS:
+            raise ValueError(f"rank_by must be one of {', '.join(RANKINGS)}")
+        self.bars = bars.reset_index(drop=True)
+        self.base_config = base_config or BacktestConfig()
+        self.workers = workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        self.min_trades = min_trades
+        self.strategy = strategy or PHASE_STRATEGY  # the rule whose parameters are searched
+        if 'spread' not in self.bars.columns:
+            self.bars['spread'] = 0.0  # BacktestConfig.spread, when set, overrides the column anyway
+
+    def _share(self, combos: List[dict]) -> SharedArrays:
+        shared = SharedArrays()
+        for field in BAR_FIELDS:
+            dtype = np.int64 if field == 'time' else np.float64
+            shared.put(f"bars/{field}", self.bars[field].to_numpy(dtype))
+        high = self.bars['high'].to_numpy(np.float64)
+        low = self.bars['low'].to_numpy(np.float64)
+        close = self.bars['close'].to_numpy(np.float64)
+        for key in sorted({window_key(combo, self.strategy.params) for combo in combos}):
+            params = replace(self.strategy.params, **dict(zip(WINDOW_FIELDS, key)))
+            indicators = compute_indicators(high, low, close, params)
+            name = "/".join(str(value) for value in key)
+            for indicator in INDICATOR_NAMES:
+                shared.put(f"ind/{name}/{indicator}", indicators[indicator])
+        return shared
+
+    def rank(self, results: pd.DataFrame) -> pd.DataFrame:
+        # Sets with fewer than min_trades trades rank after every set that has
+        # enough, and profit factors are capped so a lucky handful of wins
+        # with no loss cannot outrank everything else.
+        if results.empty:
+            return results
+        ascending = RANKINGS[self.rank_by]
+        key = results[self.rank_by]
+        if self.rank_by == 'profit_factor':
+            key = key.clip(upper=PROFIT_FACTOR_CAP)
+        ranked = results.assign(_eligible=results['trades'] >= self.min_trades, _key=key)
+        ranked = ranked.sort_values(['_eligible', '_key', 'net_profit'], ascending=[False, ascending, False], kind='stable')
+        return ranked.drop(columns=['_eligible', '_key']).reset_index(drop=True)
+
+    def execute(self, tasks: List[Tuple[int, dict, int, int]]) -> List[dict]:
+        # tasks are (index, combo, start_bar, end_bar); results keep task order
+        started = time.perf_counter()
+        shared = self._share([combo for _, combo, _, _ in tasks])
+        try:
+            chunksize = max(1, len(tasks) // (self.workers * 8))
+            with ProcessPoolExecutor(self.workers, initializer=_attach,
+                                     initargs=(shared.layout, self.base_config, self.strategy)) as pool:
+                rows = list(pool.map(_evaluate, tasks, chunksize=chunksize))
+        finally:
+            shared.close()
+        logger.info(f"Evaluated {len(tasks)} backtests on {self.workers} workers in {time.perf_counter() - started:.1f}s")
+        return rows
+
+    def search(self, combos: List[dict]) -> pd.DataFrame:
+        return self.rank(pd.DataFrame(self.execute([(i, combo, 0, len(self.bars)) for i, combo in enumerate(combos)])))
+
+    def walk_forward(self, combos: List[dict], splits=4, train_fraction=0.75) -> pd.DataFrame:
+        # Rolling folds: optimize on each train window, then score the best
+        # combination on the bars that immediately follow it.
+        n = len(self.bars)
+        fold = n // splits
+        train = int(fold * train_fraction)
+        folds = [(k * fold, k * fold + train, min(n, (k + 1) * fold)) for k in range(splits)]
+
+        tasks = [(i, combo, start, middle) for start, middle, _ in folds for i, combo in enumerate(combos)]
+        rows = self.execute(tasks)
+        best = [self.rank(pd.DataFrame(rows[k * len(combos):(k + 1) * len(combos)])).iloc[0] for k in range(splits)]
+        tests = self.execute([(k, combos[int(row['index'])], folds[k][1], folds[k][2]) for k, row in enumerate(best)])
+
+        times = self.bars['time']
+        report = []
+        for k, (row, test) in enumerate(zip(best, tests)):
+            start, middle, end = folds[k]
+            report.append({
+                'fold': k,
+                'train_start': pd.to_datetime(times.iat[start], unit='s'),
+                'test_start': pd.to_datetime(times.iat[middle], unit='s'),
+                'test_end': pd.to_datetime(times.iat[end - 1], unit='s'),
+                f'train_{self.rank_by}': row[self.rank_by],
+                'train_net_profit': row['net_profit'],
+                **{f'test_{key}': test[key] for key in ('profit_factor', 'net_profit', 'max_drawdown', 'trades')},
+                'params': json.dumps(combos[int(row['index'])], default=str),
+            })
+        return pd.DataFrame(report)
+
+
+def load_space(path: str) -> Dict[str, object]:
+    # {"ema_window": [14, 21], "tp_atr": {"range": [1.5, 4.0]}}; ranges are
+    # only valid for random search
+    with open(path) as f:
+        raw = json.load(f)
+    return {name: tuple(values["range"]) if isinstance(values, dict) else values for name, values in raw.items()}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Grid/random parameter search over the phase strategy")
+    parser.add_argument("bars", help="OHLC file (.csv, .parquet or a bar store .bars file)")
+    parser.add_argument("--space", help="JSON file mapping parameter names to value lists or [low, high] ranges")
+    parser.add_argument("--random", type=int, default=0, help="Sample this many random combinations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rank-by", default="profit_factor", choices=sorted(RANKINGS))
+    parser.add_argument("--min-trades", type=int, default=10, help="Rank sets with fewer trades last")
+    parser.add_argument("--walk-forward", type=int, default=0, help="Number of walk-forward folds")
+    parser.add_argument("--train-fraction", type=float, default=0.75)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--spread", type=float, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--strategies", default=os.getenv("TRADER_STRATEGIES"),
+                        help="Strategy file as used live (default: TRADER_STRATEGIES); its live strategy is searched")
+    parser.add_argument("--out", default=None, help="Write the full ranked table to this CSV")
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    combos = random_samples(space, args.random, args.seed) if args.random else grid(space)
+
+    optimizer = Optimizer(load_bars(args.bars), BacktestConfig(spread=args.spread),
+                          workers=args.workers, rank_by=args.rank_by, min_trades=args.min_trades,
+                          strategy=SignalEngine(load_strategies(args.strategies)).live)
+    logger.info(f"Searching {len(combos)} combinations")
+    if args.walk_forward:
+        table = optimizer.walk_forward(combos, args.walk_forward, args.train_fraction)
+    else:
+        table = optimizer.search(combos)
+    logger.info("\n" + table.head(args.top).to_string(index=False))
+    if args.out:
+        table.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional
+
+PHASE_LOSS = "phase_loss"
+DRAWDOWN = "drawdown"
+DAILY_LOSS = "daily_loss"
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+@dataclass
+class RiskLimits:
+    max_phase_loss: Optional[float] = None  # account currency, per instance and phase
+    max_drawdown_pct: Optional[float] = None  # from the session's peak equity
+    max_exposure_lots: Optional[float] = None  # open volume per symbol across instances
+    daily_loss_limit: Optional[float] = None  # account currency, from the day's first equity
+
+    @classmethod
+    def from_env(cls) -> "RiskLimits":
+        return cls(
+            max_phase_loss=_env_float("TRADER_MAX_PHASE_LOSS"),
+            max_drawdown_pct=_env_float("TRADER_MAX_DRAWDOWN_PCT"),
+            max_exposure_lots=_env_float("TRADER_MAX_EXPOSURE_LOTS"),
+            daily_loss_limit=_env_float("TRADER_DAILY_LOSS_LIMIT"),
+        )
+
+
+# Open positions of one instance, reduced to five running sums so the
+# floating P&L is two multiply-adds per tick:
+#   pnl = bid * buy_weight - buy_cost + sell_cost - ask * sell_weight + offset
+# where weight = volume * value per 1.0 price move (trade_tick_value /
+# trade_tick_size). The offset pins each position to the profit the terminal
+# reported on the last sync, which absorbs swap, commission and rounding.
+class PositionBook:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.positions: Dict[int, tuple] = {}
+        self.volumes: Dict[int, float] = {}
+        self.bid = None
+        self.ask = None
+        self.buy_weight = self.buy_cost = self.sell_weight = self.sell_cost = self.offset = 0.0
+        self.volume = 0.0
+        self.pnl = 0.0
+
+    @staticmethod
+    def _position_pnl(position: tuple, bid: float, ask: float) -> float:
+        buy, weight, price_open, offset = position
+        return (bid - price_open) * weight + offset if buy else (price_open - ask) * weight + offset
+
+    def sync(self, positions, value_per_price: float, buy_type=0) -> float:
+        # Rebuilds the sums from a positions snapshot and returns the P&L,
+        # marked at the last seen prices, of positions that have disappeared
+        # (closed by TP/SL or by us) since the previous sync.
+        realized = 0.0
+        current = {pos.ticket for pos in positions}
+        if self.bid is not None:
+            for ticket, position in self.positions.items():
+                if ticket not in current:
+                    realized += self._position_pnl(position, self.bid, self.ask)
+        self.positions = {}
+        self.volumes = {}
+        for pos in positions:
+            buy = pos.type == buy_type
+            weight = pos.volume * value_per_price
+            move = (pos.price_current - pos.price_open) * (1 if buy else -1)
+            self.positions[pos.ticket] = (buy, weight, pos.price_open, pos.profit - move * weight)
+            self.volumes[pos.ticket] = pos.volume
+        self._totals()
+        if self.bid is None:
+            self.pnl = sum(pos.profit for pos in positions)
+        return realized
+
+    def settle(self, open_tickets, prices: Optional[Dict[int, float]] = None) -> float:
+        # Drops every position not in open_tickets (just closed by us or
+        # found gone) and returns its P&L, at the close price when known and
+        # the last mark otherwise. Settling at close time keeps that P&L out
+        # of whatever phase is current at the next sync.
+        keep = set(open_tickets)
+        prices = prices or {}
+        realized = 0.0
+        for ticket in [ticket for ticket in self.positions if ticket not in keep]:
+            position = self.positions.pop(ticket)
+            del self.volumes[ticket]
+            price = prices.get(ticket)
+            if price is not None:
+                realized += self._position_pnl(position, price, price)
+            elif self.bid is not None:
+                realized += self._position_pnl(position, self.bid, self.ask)
+        self._totals()
+        if self.bid is None and not self.positions:
+            self.pnl = 0.0
+        return realized
+
+    def _totals(self):
+        self.buy_weight = self.buy_cost = self.sell_weight = self.sell_cost = self.offset = 0.0
+        for buy, weight, price_open, offset in self.positions.values():
+            if buy:
+                self.buy_weight += weight
+                self.buy_cost += weight * price_open
+            else:
+                self.sell_weight += weight
+                self.sell_cost += weight * price_open
+            self.offset += offset
+        self.volume = sum(self.volumes.values(), 0.0)
+        if self.bid is not None:
+            self.mark(self.bid, self.ask)
+
+    def mark(self, bid: float, ask: float) -> float:
+        self.bid, self.ask = bid, ask
+        self.pnl = bid * self.buy_weight - self.buy_cost + self.sell_cost - ask * self.sell_weight + self.offset
+        return self.pnl
+
+
+# Account-wide limits evaluated on every tick from the position books. Books
+# are re-synced from the (shared) positions snapshot only every
+# `sync_interval` seconds or after our own orders and closes; between syncs
+# equity moves with the tick prices alone.
+class RiskEngine:
+    def __init__(self, limits: Optional[RiskLimits] = None, sync_interval=2.0):
+        self.limits = limits or RiskLimits()
+        self.sync_interval = sync_interval
+        self.books: Dict[str, PositionBook] = {}
+        self.synced: Dict[str, float] = {}
+        self.phase_realized: Dict[str, float] = {}
+        self.balance = None
+        self.peak_equity = None
+        self.day = None
+        self.day_start_equity = None
+        self.halted_day = None
+
+    def book(self, key: str, symbol: str) -> PositionBook:
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = PositionBook(symbol)
+            self.phase_realized[key] = 0.0
+        return book
+
+    def needs_sync(self, key: str, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now - self.synced.get(key, float('-inf')) >= self.sync_interval
+
+    def invalidate(self, key: Optional[str] = None):
+        if key is None:
+            self.synced.clear()
+        else:
+            self.synced.pop(key, None)
+
+    def sync(self, key: str, symbol: str, positions, value_per_price: float, balance: Optional[float], buy_type=0):
+        realized = self.book(key, symbol).sync(positions, value_per_price, buy_type)
+        self.phase_realized[key] += realized
+        if balance is not None:
+            self.balance = balance
+        elif self.balance is not None:
+            self.balance += realized
+        self.synced[key] = time.monotonic()
+
+    def settle(self, key: str, open_tickets, prices: Optional[Dict[int, float]] = None):
+        # Realized P&L moves from the book into the balance, so equity does
+        # not jump for the other instances before the next account sync
+        book = self.books.get(key)
+        if book is not None:
+            realized = book.settle(open_tickets, prices)
+            self.phase_realized[key] += realized
+            if self.balance is not None:
+                self.balance += realized
+
+    def reset_phase(self, key: str):
+        self.phase_realized[key] = 0.0
+
+    def open_pnl(self, key: str) -> float:
+        book = self.books.get(key)
+        return book.pnl if book else 0.0
+
+    def phase_pnl(self, key: str) -> float:
+        book = self.books.get(key)
+        return self.phase_realized.get(key, 0.0) + (book.pnl if book else 0.0)
+
+    @property
+    def equity(self) -> Optional[float]:
+        if self.balance is None:
+            return None
+        return self.balance + sum(book.pnl for book in self.books.values())
+
+    def exposure(self, symbol: str) -> float:
+        return sum(book.volume for book in self.books.values() if book.symbol == symbol)
+
+    def halted(self, today: Optional[date] = None) -> bool:
+        return self.halted_day is not None and self.halted_day == (today or date.today())
+
+    def allow_order(self, symbol: str, volume: float) -> Optional[str]:
+        # Pre-trade check; returns why the order must not be sent
+        if self.halted():
+            return "daily loss limit reached, trading halted until tomorrow"
+        limit = self.limits.max_exposure_lots
+        if limit is not None and self.exposure(symbol) + volume > limit + 1e-9:
+            return f"{symbol} exposure {self.exposure(symbol):.2f} + {volume} lots exceeds {limit} lots"
+        return None
+
+    def on_tick(self, key: str, bid: float, ask: float, today: Optional[date] = None) -> Optional[str]:
+        # Marks the instance to the tick and returns the first breached limit
+        book = self.books.get(key)
+        if book is None:
+            return None
+        book.mark(bid, ask)
+        limits = self.limits
+        if limits.max_phase_loss is not None and self.phase_pnl(key) <= -limits.max_phase_loss:
+            return PHASE_LOSS
+
+        equity = self.equity
+        if equity is None:
+            return None
+        today = today or date.today()
+        if self.day != today:
+            self.day, self.day_start_equity = today, equity
+        self.peak_equity = equity if self.peak_equity is None else max(self.peak_equity, equity)
+        if limits.max_drawdown_pct is not None and self.peak_equity > 0:
+            if (self.peak_equity - equity) / self.peak_equity * 100 >= limits.max_drawdown_pct:
+                return DRAWDOWN
+        if limits.daily_loss_limit is not None and not self.halted(today):
+            if self.day_start_equity - equity >= limits.daily_loss_limit:
+                self.halted_day = today
+                return DAILY_LOSS
+        return None
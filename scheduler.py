@@ -0,0 +1,46 @@
+import time
+from typing import Optional
+
+
+# Decides, tick by tick, whether a strategy instance needs a full
+# re-evaluation. The fast path only compares the tick against the last
+# evaluated bar and price, so idle ticks cost a couple of comparisons.
+class TickScheduler:
+    def __init__(self, period_seconds: int, price_threshold=0.0005, poll_interval=0.25, status_interval=20):
+        self.period_seconds = period_seconds
+        self.price_threshold = price_threshold
+        self.poll_interval = poll_interval
+        self.status_interval = status_interval
+        self.last_tick_msc = None
+        self.last_bar = None
+        self.last_price = None
+        self.last_status = 0.0
+
+    def is_new_tick(self, tick) -> bool:
+        if tick is None:
+            return False
+        stamp = getattr(tick, 'time_msc', None) or tick.time * 1000
+        if stamp == self.last_tick_msc:
+            return False
+        self.last_tick_msc = stamp
+        return True
+
+    def bar_index(self, tick) -> int:
+        return int(tick.time) // self.period_seconds
+
+    def should_evaluate(self, tick) -> bool:
+        if self.last_bar is None or self.bar_index(tick) > self.last_bar:
+            return True
+        price = (tick.bid + tick.ask) / 2
+        return abs(price - self.last_price) >= self.last_price * self.price_threshold
+
+    def mark_evaluated(self, tick):
+        self.last_bar = self.bar_index(tick)
+        self.last_price = (tick.bid + tick.ask) / 2
+
+    def status_due(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        if now - self.last_status >= self.status_interval:
+            self.last_status = now
+            return True
+        return False
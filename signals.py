@@ -0,0 +1,198 @@
+import ast
+import json
+from dataclasses import dataclass, field, fields, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from strategy import StrategyParams
+
+SIGNAL_COLUMNS = ('open', 'high', 'low', 'close', 'tick_volume', 'spread', 'ema', 'rsi', 'atr', 'momentum')
+PARAM_NAMES = tuple(f.name for f in fields(StrategyParams))
+WINDOW_FIELDS = ('ema_window', 'rsi_window', 'atr_window', 'momentum_period')
+FUNCTIONS = {'abs': np.abs, 'min': np.minimum, 'max': np.maximum}
+# What and/or/not compile to; the names cannot clash with rule names
+LOGIC = {'_and': np.logical_and, '_or': np.logical_or, '_not': np.logical_not}
+RULES = ('buy', 'sell', 'strong_buy', 'strong_sell')
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Compare, ast.Gt, ast.GtE, ast.Lt, ast.LtE,
+    ast.Eq, ast.NotEq, ast.Name, ast.Load, ast.Constant, ast.Call,
+)
+
+
+@dataclass
+class SignalStrategy:
+    name: str
+    buy: str
+    sell: str
+    strong_buy: str = "False"
+    strong_sell: str = "False"
+    params: StrategyParams = field(default_factory=StrategyParams)
+    shadow: bool = False
+
+
+# The rule check_conditions used to hard-code
+PHASE_STRATEGY = SignalStrategy(
+    name="phase",
+    buy="close > ema and rsi > rsi_buy",
+    sell="close < ema and rsi < rsi_sell",
+    strong_buy="momentum > atr * strong_move_threshold",
+    strong_sell="abs(momentum) > atr * strong_move_threshold",
+)
+
+
+def _call(name: str, *args) -> ast.Call:
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=list(args), keywords=[])
+
+
+class _Vectorize(ast.NodeTransformer):
+    # `and`/`or`/`not` become np.logical_and/or/not, which are elementwise and
+    # also right on bool and int constants (~True is -2); chained comparisons
+    # become pairwise comparisons joined by &
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        name = '_and' if isinstance(node.op, ast.And) else '_or'
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = _call(name, result, value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        pairs = [
+            ast.Compare(left=left, ops=[op], comparators=[right])
+            for left, op, right in zip(operands, node.ops, operands[1:])
+        ]
+        result = pairs[0]
+        for pair in pairs[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=pair)
+        return result
+
+
+def compile_rule(text: str) -> Tuple[Callable[[dict], np.ndarray], set]:
+    # Returns the vectorized rule and the names it reads. Only arithmetic,
+    # comparisons, boolean logic, numeric constants and abs/min/max over
+    # indicator columns and StrategyParams fields are accepted.
+    tree = ast.parse(text, mode='eval')
+    names = set()
+    callees = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in rule {text!r}: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, bool)):
+            raise ValueError(f"Unsupported constant in rule {text!r}: {node.value!r}")
+        if isinstance(node, ast.Call) and (
+            not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords
+        ):
+            raise ValueError(f"Unsupported call in rule {text!r}")
+        if isinstance(node, ast.Name) and node.id in FUNCTIONS and id(node) not in callees:
+            raise ValueError(f"Function {node.id!r} used as a value in rule {text!r}")
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS:
+            if node.id not in SIGNAL_COLUMNS and node.id not in PARAM_NAMES:
+                raise ValueError(f"Unknown name {node.id!r} in rule {text!r}")
+            names.add(node.id)
+    code = compile(ast.fix_missing_locations(_Vectorize().visit(tree)), f"<rule {text}>", 'eval')
+    scope = {'__builtins__': {}, **FUNCTIONS, **LOGIC}
+    return (lambda namespace: eval(code, scope, namespace)), names
+
+
+# Evaluates every strategy against the latest bar of every symbol in one
+# NumPy pass. Strategies that share rule expressions and differ only in
+# parameters are stacked into one group, so their thresholds broadcast as a
+# (strategies, 1) column against (1, symbols) indicator rows and each rule is
+# evaluated once per group, however many variants are running.
+class SignalEngine:
+    def __init__(self, strategies: List[SignalStrategy]):
+        names = [strategy.name for strategy in strategies]
+        if len(set(names)) != len(names):
+            raise ValueError("Strategy names must be unique")
+        live = [strategy for strategy in strategies if not strategy.shadow]
+        if len(live) != 1:
+            raise ValueError(f"Exactly one live strategy is required, got {len(live)}")
+        self.live = live[0]
+        for strategy in strategies:
+            windows = [getattr(strategy.params, name) for name in WINDOW_FIELDS]
+            if windows != [getattr(self.live.params, name) for name in WINDOW_FIELDS]:
+                raise ValueError(f"Strategy {strategy.name} must use the live indicator windows")
+        self.strategies = strategies
+        self.index = {name: i for i, name in enumerate(names)}
+        self.groups = []
+        self.columns = set()  # indicator columns the rules read
+        grouped: Dict[tuple, List[int]] = {}
+        for i, strategy in enumerate(strategies):
+            grouped.setdefault(tuple(getattr(strategy, rule) for rule in RULES), []).append(i)
+        for texts, members in grouped.items():
+            compiled = [compile_rule(text) for text in texts]
+            read = set().union(*(names for _, names in compiled))
+            self.columns |= read & set(SIGNAL_COLUMNS)
+            used = read & set(PARAM_NAMES)
+            params = {
+                name: np.array([[getattr(strategies[i].params, name)] for i in members], dtype=np.float64)
+                for name in used
+            }
+            self.groups.append((np.array(members), [rule for rule, _ in compiled], params))
+
+    def evaluate(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        # columns: indicator name -> (symbols,) array of latest values.
+        # Returns direction (+1/-1/0, int8) and strong (bool), both shaped
+        # (strategies, symbols).
+        rows = {name: np.asarray(values, dtype=np.float64)[np.newaxis, :] for name, values in columns.items()}
+        count = next(iter(rows.values())).shape[1]
+        direction = np.zeros((len(self.strategies), count), dtype=np.int8)
+        strong = np.zeros((len(self.strategies), count), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for members, rules, params in self.groups:
+                namespace = {**rows, **params}
+                shape = (len(members), count)
+                buy, sell, strong_buy, strong_sell = (
+                    np.broadcast_to(np.asarray(rule(namespace), dtype=bool), shape) for rule in rules
+                )
+                bullish = buy
+                bearish = ~bullish & sell
+                direction[members] = np.where(bullish, 1, np.where(bearish, -1, 0))
+                strong[members] = np.where(bullish, strong_buy, strong_sell) & (bullish | bearish)
+        return direction, strong
+
+
+def series_signals(strategy: SignalStrategy, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    # The same compiled rule over a whole bar history, for the backtester and
+    # optimizer: every bar is one column of SignalEngine.evaluate. Returns
+    # direction and strong, both shaped (bars,).
+    engine = SignalEngine([replace(strategy, shadow=False)])
+    missing = engine.columns - set(columns)
+    if missing:
+        raise ValueError(f"Strategy {strategy.name} reads columns the bars do not have: {', '.join(sorted(missing))}")
+    direction, strong = engine.evaluate({name: values for name, values in columns.items() if name in SIGNAL_COLUMNS})
+    return direction[0], strong[0]
+
+
+def signal_labels(direction: int, strong: bool) -> Tuple[Optional[str], Optional[str]]:
+    # The (trend_type, strength) pair the trading loop works with
+    if direction == 0:
+        return None, None
+    return ('bullish' if direction > 0 else 'bearish'), ('extreme' if strong else 'normal')
+
+
+def load_strategies(path: Optional[str]) -> List[SignalStrategy]:
+    # JSON list of {"name", "buy", "sell", "strong_buy", "strong_sell",
+    # "params": {StrategyParams overrides}, "shadow"}. Without a live entry
+    # the built-in phase strategy trades and the file only adds shadows.
+    if not path:
+        return [PHASE_STRATEGY]
+    with open(path) as f:
+        raw = json.load(f)
+    strategies = [
+        SignalStrategy(**{**spec, 'params': StrategyParams(**spec.get('params', {}))}) for spec in raw
+    ]
+    if all(strategy.shadow for strategy in strategies):
+        strategies.insert(0, PHASE_STRATEGY)
+    return strategies
@@ -0,0 +1,481 @@
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from market_data import RATES_DTYPE
+
+logger = logging.getLogger(__name__)
+
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+SymbolInfo = namedtuple('SymbolInfo', 'name digits point spread trade_contract_size trade_tick_size trade_tick_value '
+                                      'trade_stops_level volume_min volume_max volume_step bid ask select')
+AccountInfo = namedtuple('AccountInfo', 'login server currency leverage balance equity profit margin margin_free')
+TradePosition = namedtuple('TradePosition', 'ticket time time_msc type magic identifier volume price_open sl tp '
+                                            'price_current swap profit symbol comment')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment request_id request')
+
+# name: (start price, point, digits, spread in points, contract size, volatility per tick in points)
+DEFAULT_SYMBOLS = {
+    "XAUUSD": (2000.0, 0.01, 2, 30, 100, 8),
+    "XAGUSD": (25.0, 0.001, 3, 30, 5000, 4),
+    "EURUSD": (1.08, 0.00001, 5, 10, 100000, 3),
+    "GBPUSD": (1.27, 0.00001, 5, 12, 100000, 3),
+    "USDJPY": (150.0, 0.001, 3, 12, 100000, 3),
+}
+
+
+class SimulatedSymbol:
+    def __init__(self, name, price, point, digits, spread, contract_size, volatility, rng):
+        self.name = name
+        self.point = point
+        self.digits = digits
+        self.spread = spread
+        self.contract_size = contract_size
+        self.volatility = volatility * point
+        self.rng = rng
+        self.bid = price
+        self.bars: Dict[int, list] = {}
+
+    @property
+    def ask(self) -> float:
+        return round(self.bid + self.spread * self.point, self.digits)
+
+    def next_bid(self) -> float:
+        self.bid = round(max(self.point, self.bid + self.rng.gauss(0, self.volatility)), self.digits)
+        return self.bid
+
+    def seed_history(self, timeframe: int, seconds: int, now: int, count: int):
+        # Synthetic random-walk history that ends at the current price
+        steps = np.array([self.rng.gauss(0, self.volatility * math.sqrt(seconds)) for _ in range(count)])
+        closes = self.bid - np.cumsum(steps[::-1])[::-1] + steps
+        start = now - now % seconds - count * seconds
+        bars = []
+        previous = closes[0]
+        for index, close in enumerate(closes):
+            wick = abs(self.rng.gauss(0, self.volatility * math.sqrt(seconds) / 2))
+            high = max(previous, close) + wick
+            low = min(previous, close) - wick
+            bars.append([start + index * seconds, previous, high, low, close, seconds, self.spread, 0])
+            previous = close
+        self.bars[timeframe] = bars
+
+    def update_bars(self, now: int, seconds_by_timeframe: Dict[int, int]):
+        for timeframe, bars in self.bars.items():
+            seconds = seconds_by_timeframe[timeframe]
+            bar_time = now - now % seconds
+            if bars and bars[-1][0] == bar_time:
+                bar = bars[-1]
+                bar[2] = max(bar[2], self.bid)
+                bar[3] = min(bar[3], self.bid)
+                bar[4] = self.bid
+                bar[5] += 1
+            else:
+                bars.append([bar_time, self.bid, self.bid, self.bid, self.bid, 1, self.spread, 0])
+                if len(bars) > 20000:
+                    del bars[:len(bars) - 20000]
+
+
+# In-process stand-in for the MetaTrader5 module. It exposes the calls and
+# constants bot.py uses and replays recorded or synthetic ticks against a
+# simulated clock that runs at `ticks_per_second`, independent of wall time.
+class SimulatedMT5:
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+
+    TRADE_ACTION_DEAL = 1
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_REJECT = 10006
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_MARKET_CLOSED = 10018
+    TRADE_RETCODE_NO_MONEY = 10019
+    TRADE_RETCODE_PRICE_CHANGED = 10020
+    TRADE_RETCODE_POSITION_CLOSED = 10036
+
+    TIMEFRAME_SECONDS = {
+        TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+        TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400,
+    }
+
+    def __init__(self, ticks_per_second=10.0, tick_interval=1.0, balance=10000.0, leverage=100,
+                 ticks: Optional[pd.DataFrame] = None, history=1000, requote_rate=0.0, latency=0.0, seed=None):
+        self.ticks_per_second = ticks_per_second
+        self.tick_interval = tick_interval
+        self.leverage = leverage
+        self.history = history
+        self.requote_rate = requote_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        self.recorded = None
+        if ticks is not None:
+            self.recorded = {
+                'time': ticks['time'].to_numpy(np.int64),
+                'bid': ticks['bid'].to_numpy(np.float64),
+                'ask': ticks['ask'].to_numpy(np.float64) if 'ask' in ticks else None,
+                'symbol': ticks['symbol'].to_numpy(object) if 'symbol' in ticks else None,
+            }
+        self.symbols: Dict[str, SimulatedSymbol] = {}
+        self.positions: Dict[int, dict] = {}
+        self.balance = balance
+        self.next_ticket = 1
+        self.error = (1, "Success")
+        self.connected = False
+        self.tick_count = 0
+        self.started = None
+        self.start_time = int(ticks['time'].iloc[0]) if ticks is not None else int(time.time())
+        self.now = self.start_time
+        self.stats = {"orders": 0, "rejected": 0, "requotes": 0, "closed_by_sl": 0, "closed_by_tp": 0}
+
+    @classmethod
+    def from_env(cls):
+        ticks = None
+        path = os.getenv("TRADER_SIM_TICKS")
+        if path:
+            ticks = load_ticks(path)
+        return cls(
+            ticks_per_second=float(os.getenv("TRADER_SIM_SPEED", "10")),
+            balance=float(os.getenv("TRADER_SIM_BALANCE", "10000")),
+            ticks=ticks,
+            requote_rate=float(os.getenv("TRADER_SIM_REQUOTE_RATE", "0")),
+            latency=float(os.getenv("TRADER_SIM_LATENCY", "0")),
+        )
+
+    # -- clock ---------------------------------------------------------------
+
+    def _advance(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.started is None:
+            return
+        target = int((time.monotonic() - self.started) * self.ticks_per_second)
+        if self.recorded is not None:
+            target = min(target, len(self.recorded['time']) - 1)
+        while self.tick_count < target:
+            self.tick_count += 1
+            self._step()
+
+    def _step(self):
+        if self.recorded is not None:
+            recorded, index = self.recorded, self.tick_count
+            self.now = int(recorded['time'][index])
+            for symbol in self.symbols.values():
+                if recorded['symbol'] is None or recorded['symbol'][index] == symbol.name:
+                    symbol.bid = float(recorded['bid'][index])
+                    if recorded['ask'] is not None:
+                        symbol.spread = max(0, round((recorded['ask'][index] - symbol.bid) / symbol.point))
+        else:
+            self.now = self.start_time + int(self.tick_count * self.tick_interval)
+            for symbol in self.symbols.values():
+                symbol.next_bid()
+        for symbol in self.symbols.values():
+            symbol.update_bars(self.now, self.TIMEFRAME_SECONDS)
+        self._check_stops()
+
+    def _check_stops(self):
+        for ticket, position in list(self.positions.items()):
+            symbol = self.symbols[position['symbol']]
+            buy = position['type'] == self.ORDER_TYPE_BUY
+            price = symbol.bid if buy else symbol.ask
+            if position['sl'] and (price <= position['sl'] if buy else price >= position['sl']):
+                self.stats["closed_by_sl"] += 1
+                self._close(ticket, position['sl'])
+            elif position['tp'] and (price >= position['tp'] if buy else price <= position['tp']):
+                self.stats["closed_by_tp"] += 1
+                self._close(ticket, position['tp'])
+
+    def _profit(self, position, price=None) -> float:
+        symbol = self.symbols[position['symbol']]
+        buy = position['type'] == self.ORDER_TYPE_BUY
+        if price is None:
+            price = symbol.bid if buy else symbol.ask
+        direction = 1 if buy else -1
+        return direction * (price - position['price_open']) * position['volume'] * symbol.contract_size
+
+    def _close(self, ticket, price, volume=None):
+        position = self.positions[ticket]
+        volume = position['volume'] if volume is None else min(volume, position['volume'])
+        closed = dict(position, volume=volume)
+        self.balance += self._profit(closed, price)
+        position['volume'] = round(position['volume'] - volume, 8)
+        if position['volume'] <= 0:
+            del self.positions[ticket]
+
+    # -- MetaTrader5 API -----------------------------------------------------
+
+    def initialize(self, *args, **kwargs) -> bool:
+        with self.lock:
+            self.connected = True
+            if self.started is None:
+                self.started = time.monotonic()
+            return True
+
+    def login(self, login=None, password=None, server=None, **kwargs) -> bool:
+        with self.lock:
+            self.login_id = login or 0
+            self.server = server or "Simulator"
+            return self.connected
+
+    def shutdown(self):
+        with self.lock:
+            self.connected = False
+            return True
+
+    def last_error(self):
+        return self.error
+
+    def version(self):
+        return (500, 0, "simulator")
+
+    def symbol_select(self, symbol: str, enable=True) -> bool:
+        with self.lock:
+            self._advance()
+            if symbol not in self.symbols:
+                price, point, digits, spread, contract, volatility = DEFAULT_SYMBOLS.get(
+                    symbol, (100.0, 0.01, 2, 20, 100, 5)
+                )
+                if self.recorded is not None:
+                    bids = self.recorded['bid']
+                    if self.recorded['symbol'] is not None:
+                        bids = bids[self.recorded['symbol'] == symbol]
+                    if len(bids) == 0:
+                        self.error = (-1, f"No recorded ticks for {symbol}")
+                        return False
+                    price = float(bids[0])
+                sim = SimulatedSymbol(symbol, price, point, digits, spread, contract, volatility, self.rng)
+                for timeframe, seconds in self.TIMEFRAME_SECONDS.items():
+                    sim.seed_history(timeframe, seconds, self.now, self.history)
+                self.symbols[symbol] = sim
+            return True
+
+    def _symbol(self, symbol: str) -> Optional[SimulatedSymbol]:
+        sim = self.symbols.get(symbol)
+        if sim is None:
+            self.error = (-1, f"Symbol {symbol} not selected")
+        return sim
+
+    def symbol_info_tick(self, symbol: str):
+        with self.lock:
+            self._advance()
+            sim = self._symbol(symbol)
+            if sim is None:
+                return None
+            now_msc = self.now * 1000 + self.tick_count % 1000
+            return Tick(self.now, sim.bid, sim.ask, sim.bid, 1, now_msc, 6, 1.0)
+
+    def symbol_info(self, symbol: str):
+        with self.lock:
+            self._advance()
+            sim = self._symbol(symbol)
+            if sim is None:
+                return None
+            return SymbolInfo(symbol, sim.digits, sim.point, sim.spread, sim.contract_size, sim.point,
+                              sim.contract_size * sim.point, 0, 0.01, 100.0, 0.01, sim.bid, sim.ask, True)
+
+    def _account(self) -> tuple:
+        # (profit, margin, equity) at the current prices, without moving the clock
+        profit = sum(self._profit(position) for position in self.positions.values())
+        margin = sum(self._margin(position) for position in self.positions.values())
+        return profit, margin, self.balance + profit
+
+    def account_info(self):
+        with self.lock:
+            self._advance()
+            profit, margin, equity = self._account()
+            return AccountInfo(getattr(self, 'login_id', 0), getattr(self, 'server', "Simulator"), "USD",
+                               self.leverage, round(self.balance, 2), round(equity, 2), round(profit, 2),
+                               round(margin, 2), round(equity - margin, 2))
+
+    def _margin(self, position) -> float:
+        sim = self.symbols[position['symbol']]
+        return position['volume'] * sim.contract_size * position['price_open'] / self.leverage
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        with self.lock:
+            self._advance()
+            result = []
+            for position in self.positions.values():
+                if symbol is not None and position['symbol'] != symbol:
+                    continue
+                if ticket is not None and position['ticket'] != ticket:
+                    continue
+                sim = self.symbols[position['symbol']]
+                current = sim.bid if position['type'] == self.ORDER_TYPE_BUY else sim.ask
+                result.append(TradePosition(
+                    position['ticket'], position['time'], position['time'] * 1000, position['type'],
+                    position['magic'], position['ticket'], position['volume'], position['price_open'],
+                    position['sl'], position['tp'], current, 0.0, round(self._profit(position), 2),
+                    position['symbol'], position['comment'],
+                ))
+            return tuple(result)
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        with self.lock:
+            self._advance()
+            sim = self._symbol(symbol)
+            if sim is None or timeframe not in sim.bars:
+                return None
+            bars = sim.bars[timeframe]
+            end = len(bars) - start_pos
+            return np.array([tuple(bar) for bar in bars[max(0, end - count):max(0, end)]], dtype=RATES_DTYPE)
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from, date_to):
+        with self.lock:
+            self._advance()
+            sim = self._symbol(symbol)
+            if sim is None or timeframe not in sim.bars:
+                return None
+            start, end = _epoch(date_from), _epoch(date_to)
+            return np.array([tuple(bar) for bar in sim.bars[timeframe] if start <= bar[0] <= end], dtype=RATES_DTYPE)
+
+    def _result(self, retcode, request, comment, price=0.0, volume=0.0, order=0, bid=0.0, ask=0.0):
+        if retcode == self.TRADE_RETCODE_DONE:
+            self.stats["orders"] += 1
+        elif retcode in (self.TRADE_RETCODE_REQUOTE, self.TRADE_RETCODE_PRICE_CHANGED):
+            self.stats["requotes"] += 1
+        else:
+            self.stats["rejected"] += 1
+        return OrderSendResult(retcode, order, order, volume, price, bid, ask, comment, 0, request)
+
+    def _next_ticket(self) -> int:
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        return ticket
+
+    def order_send(self, request: dict):
+        with self.lock:
+            self._advance()
+            if request.get("action") != self.TRADE_ACTION_DEAL:
+                return self._result(self.TRADE_RETCODE_INVALID, request, "Unsupported action")
+            sim = self._symbol(request.get("symbol"))
+            if sim is None:
+                return self._result(self.TRADE_RETCODE_INVALID, request, "Unknown symbol")
+            volume = float(request.get("volume", 0))
+            if volume < 0.01 or volume > 100 or abs(round(volume / 0.01) * 0.01 - volume) > 1e-9:
+                return self._result(self.TRADE_RETCODE_INVALID_VOLUME, request, "Invalid volume")
+            buy = request.get("type") == self.ORDER_TYPE_BUY
+            price = sim.ask if buy else sim.bid
+            deviation = request.get("deviation", 0) * sim.point
+            requested = request.get("price") or price
+            if abs(requested - price) > deviation + 1e-12 or self.rng.random() < self.requote_rate:
+                return self._result(self.TRADE_RETCODE_REQUOTE, request, "Requote", bid=sim.bid, ask=sim.ask)
+
+            # Tickets are only used up by accepted orders
+            if request.get("position"):
+                position = self.positions.get(request["position"])
+                if position is None:
+                    return self._result(self.TRADE_RETCODE_POSITION_CLOSED, request, "Position closed")
+                if (position['type'] == self.ORDER_TYPE_BUY) == buy:
+                    return self._result(self.TRADE_RETCODE_INVALID, request, "Close must be the opposite side")
+                ticket = self._next_ticket()
+                self._close(request["position"], price, volume)
+                return self._result(self.TRADE_RETCODE_DONE, request, "Request executed", price, volume, ticket,
+                                    sim.bid, sim.ask)
+
+            sl, tp = request.get("sl", 0.0) or 0.0, request.get("tp", 0.0) or 0.0
+            if (sl and (sl >= price if buy else sl <= price)) or (tp and (tp <= price if buy else tp >= price)):
+                return self._result(self.TRADE_RETCODE_INVALID_STOPS, request, "Invalid stops")
+            position = {
+                'ticket': None, 'time': self.now, 'type': request.get("type"), 'magic': request.get("magic", 0),
+                'volume': volume, 'price_open': price, 'sl': sl, 'tp': tp, 'symbol': sim.name,
+                'comment': request.get("comment", ""),
+            }
+            # Margin from the internal state at the quoted prices; account_info()
+            # would advance the clock (and sleep the latency) mid-order
+            _, margin, equity = self._account()
+            if self._margin(position) > equity - margin:
+                return self._result(self.TRADE_RETCODE_NO_MONEY, request, "No money")
+            ticket = position['ticket'] = self._next_ticket()
+            self.positions[ticket] = position
+            return self._result(self.TRADE_RETCODE_DONE, request, "Request executed", price, volume, ticket,
+                                sim.bid, sim.ask)
+
+
+def _epoch(value) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def load_ticks(path: str) -> pd.DataFrame:
+    # CSV/Parquet with time (epoch seconds or datetime), bid[, ask][, symbol]
+    ticks = pd.read_parquet(path) if path.endswith(('.parquet', '.pq')) else pd.read_csv(path)
+    ticks.columns = [column.strip().lower() for column in ticks.columns]
+    if not pd.api.types.is_numeric_dtype(ticks['time']):
+        ticks['time'] = (pd.to_datetime(ticks['time']) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return ticks.sort_values('time', kind='stable').reset_index(drop=True)
+
+
+async def soak(instances: str, duration: float, max_trades: int, profit_target: float, max_phases: int):
+    import bot
+
+    engine = bot.TradingEngine(instances=bot.parse_instances(instances))
+    if not await engine.connect_mt5():
+        raise RuntimeError("Simulator connection failed")
+    await engine.handle_config(str(max_trades), str(profit_target), str(max_phases))
+    started = time.perf_counter()
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(duration)
+    engine.stop()
+    await task
+    elapsed = time.perf_counter() - started
+    sim = bot.mt5
+    account = sim.account_info()
+    logger.info(
+        f"Soak finished: {elapsed:.1f}s wall, {sim.tick_count} ticks ({sim.tick_count / elapsed:.0f}/s), "
+        f"stats={sim.stats}, balance={account.balance}, equity={account.equity}"
+    )
+    await engine.notifier.close()
+    await engine.journal.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Soak-test the trading loop against the in-process MT5 simulator")
+    parser.add_argument("--instances", default="XAUUSD:M15")
+    parser.add_argument("--speed", type=float, default=1000, help="Simulated ticks per wall-clock second")
+    parser.add_argument("--ticks", default=None, help="Recorded tick file to replay instead of a random walk")
+    parser.add_argument("--duration", type=float, default=30, help="Wall-clock seconds to run")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency added to every call")
+    parser.add_argument("--requote-rate", type=float, default=0.0)
+    parser.add_argument("--max-trades", type=int, default=3)
+    parser.add_argument("--profit-target", type=float, default=6.2)
+    parser.add_argument("--max-phases", type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ["TRADER_BROKER"] = "sim"
+    os.environ["TRADER_SIM_SPEED"] = str(args.speed)
+    os.environ["TRADER_SIM_LATENCY"] = str(args.latency)
+    os.environ["TRADER_SIM_REQUOTE_RATE"] = str(args.requote_rate)
+    os.environ.setdefault("MT5_LOGIN", "0")
+    os.environ.setdefault("TRADER_JOURNAL", ":memory:")
+    if args.ticks:
+        os.environ["TRADER_SIM_TICKS"] = args.ticks
+    asyncio.run(soak(args.instances, args.duration, args.max_trades, args.profit_target, args.max_phases))
+
+
+if __name__ == "__main__":
+    main()
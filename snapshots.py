@@ -0,0 +1,65 @@
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import metrics
+
+
+# Shared view of broker state for one process. Symbol specs (volume limits,
+# digits, tick size, stops level) are fetched once per session; account,
+# positions and ticks are short-lived snapshots that every consumer within
+# the same loop iteration reuses instead of issuing its own call.
+class BrokerSnapshots:
+    def __init__(self, call: Callable[..., Awaitable], ttl=0.2, tick_ttl=0.1):
+        self.call = call
+        self.ttl = ttl
+        self.tick_ttl = tick_ttl
+        self.specs: Dict[str, object] = {}
+        self.snapshots: Dict[Tuple, Tuple[float, object]] = {}
+
+    def reset(self):
+        self.specs.clear()
+        self.snapshots.clear()
+
+    def invalidate(self, *kinds: str):
+        # Drop snapshots of the given kinds ("account", "positions", "tick"),
+        # or everything when no kind is given
+        for key in [key for key in self.snapshots if not kinds or key[0] in kinds]:
+            del self.snapshots[key]
+
+    def invalidate_trading(self):
+        self.invalidate("account", "positions")
+
+    async def _snapshot(self, key: Tuple, ttl: float, name: str, *args, fresh=False, **kwargs):
+        now = time.monotonic()
+        cached = self.snapshots.get(key)
+        if not fresh and cached is not None and cached[0] > now:
+            metrics.inc("snapshot_hits_total", kind=key[0])
+            return cached[1]
+        metrics.inc("snapshot_misses_total", kind=key[0])
+        value = await self.call(name, *args, **kwargs)
+        if value is not None:
+            self.snapshots[key] = (time.monotonic() + ttl, value)
+        return value
+
+    async def symbol_spec(self, symbol: str):
+        spec = self.specs.get(symbol)
+        if spec is None:
+            spec = await self.call("symbol_info", symbol)
+            if spec is not None:
+                self.specs[symbol] = spec
+        return spec
+
+    async def account(self, fresh=False):
+        return await self._snapshot(("account",), self.ttl, "account_info", fresh=fresh)
+
+    async def positions(self, symbol: Optional[str] = None, fresh=False) -> Optional[list]:
+        # One positions_get() for the whole account serves every instance.
+        # None means the call failed, which callers must not mistake for "no
+        # positions" (that would read as everything having been closed).
+        positions = await self._snapshot(("positions",), self.ttl, "positions_get", fresh=fresh)
+        if positions is None:
+            return None
+        return [pos for pos in positions if symbol is None or pos.symbol == symbol]
+
+    async def tick(self, symbol: str, fresh=False):
+        return await self._snapshot(("tick", symbol), self.tick_ttl, "symbol_info_tick", symbol, fresh=fresh)
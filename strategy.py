@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Tunables of the phase strategy. The entry rules themselves are expressions
+# over these fields and the indicator columns (signals.PHASE_STRATEGY, or a
+# TRADER_STRATEGIES file), compiled once by signals.py for the live bot, the
+# backtester and the optimizer alike.
+@dataclass
+class StrategyParams:
+    ema_window: int = 21
+    rsi_window: int = 14
+    atr_window: int = 14
+    momentum_period: int = 3
+    rsi_buy: float = 55
+    rsi_sell: float = 45
+    strong_move_threshold: float = 1.8
+    tp_atr: float = 3.0
+    sl_atr: float = 1.5
+    base_lot: float = 0.02
+    strong_lot: float = 0.04
+
+
+def lot_for_strength(strength: str, params: StrategyParams) -> float:
+    return params.strong_lot if strength == 'extreme' else params.base_lot
+
+
+def trade_levels(price: float, atr: float, trend_type: str, params: StrategyParams) -> Tuple[float, float]:
+    tp_distance = params.tp_atr * atr
+    sl_distance = params.sl_atr * atr
+    tp_price = price + tp_distance if trend_type == 'bullish' else price - tp_distance
+    sl_price = price - sl_distance if trend_type == 'bullish' else price + sl_distance
+    return tp_price, sl_price
+
+
+def compute_indicators(high, low, close, params: StrategyParams) -> dict:
+    # Vectorized equivalents of the ta indicators used live (same seeding as
+    # market_data.IndicatorState), returned as float64 arrays.
+    close = pd.Series(np.asarray(close, dtype=np.float64))
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(close)
+
+    ema = close.ewm(span=params.ema_window, min_periods=params.ema_window, adjust=False).mean()
+
+    diff = close.diff(1)
+    up = diff.where(diff > 0, 0.0)
+    down = -diff.where(diff < 0, 0.0)
+    avg_up = up.ewm(alpha=1 / params.rsi_window, min_periods=params.rsi_window, adjust=False).mean()
+    avg_down = down.ewm(alpha=1 / params.rsi_window, min_periods=params.rsi_window, adjust=False).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_down == 0, 100.0, 100 - 100 / (1 + avg_up / avg_down))
+    rsi[avg_down.isna().to_numpy()] = np.nan
+
+    prev_close = np.concatenate(([np.nan], close.to_numpy()[:-1]))
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = np.zeros(n)
+    window = params.atr_window
+    if n >= window:
+        # Wilder smoothing is an EWM with alpha=1/window seeded by the SMA of
+        # the first window true ranges
+        seeded = true_range[window - 1:].copy()
+        seeded[0] = true_range[:window].mean()
+        atr[window - 1:] = pd.Series(seeded).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+
+    momentum = close.pct_change(params.momentum_period, fill_method=None)
+    return {
+        'ema': ema.to_numpy(),
+        'rsi': rsi,
+        'atr': atr,
+        'momentum': momentum.to_numpy(),
+    }
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+
+from bar_store import BarStore, backfill
+from simulator import SimulatedMT5
+
+
+def utc(epoch) -> datetime:
+    return datetime.fromtimestamp(int(epoch), timezone.utc)
+
+
+class BarStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="bars-test-")
+        self.sim = SimulatedMT5(ticks_per_second=0, history=1000, seed=3)
+        self.sim.initialize()
+        self.sim.symbol_select("XAUUSD", True)
+        self.rates = self.sim.copy_rates_from_pos("XAUUSD", self.sim.TIMEFRAME_M15, 0, 1000)
+        self.store = BarStore(self.root)
+        self.series = self.store.series("XAUUSD", "M15")
+
+    def tearDown(self):
+        self.series._release()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def assertContiguous(self):
+        self.assertEqual(set(np.diff(self.series.bars()['time']).tolist()), {900})
+
+    def test_backfill_from_after_the_stored_range_leaves_no_hole(self):
+        self.series.append(self.rates[:100])
+        backfill(self.sim, self.store, "XAUUSD", "M15", utc(self.rates['time'][500]), utc(self.rates['time'][-1]))
+        self.assertContiguous()
+        self.assertEqual(len(self.series), 999)
+
+    def test_backfill_of_older_history_reaches_the_stored_range(self):
+        self.series.append(self.rates[500:600])
+        backfill(self.sim, self.store, "XAUUSD", "M15", utc(self.rates['time'][0]), utc(self.rates['time'][100]))
+        self.assertContiguous()
+        self.assertEqual(int(self.series.bars()['time'][0]), int(self.rates['time'][0]))
+        self.assertEqual(len(self.series), 600)
+
+    def test_append_refuses_newer_bars_after_a_hole(self):
+        self.series.append(self.rates[:100])
+        self.assertEqual(self.series.append(self.rates[200:300]), 0)
+        self.assertEqual(len(self.series), 100)
+        self.assertEqual(self.series.append(self.rates[200:300], contiguous=True), 100)
+
+    def test_append_refuses_older_bars_before_a_hole(self):
+        self.series.append(self.rates[500:600])
+        self.assertEqual(self.series.append(self.rates[:100]), 0)
+        self.assertEqual(self.series.append(self.rates[:501]), 500)
+        self.assertContiguous()
+
+    def test_warm_start_falls_back_when_the_terminal_lacks_the_stored_bar(self):
+        os.environ.update(TRADER_BROKER="sim", TRADER_JOURNAL=":memory:", TRADER_BAR_STORE=self.root)
+        import bot
+        from mt5_executor import MT5Executor
+
+        bot.mt5, bot.mt5_executor = self.sim, MT5Executor(self.sim)
+        old = self.rates[:1].copy()
+        old['time'] -= 10 ** 7
+
+        async def scenario():
+            engine = bot.TradingEngine(instances=(("XAUUSD", "M15"),))
+            try:
+                trader = engine.traders[0]
+                trader.bar_series.append(old)
+                return await trader.fetch_rates()
+            finally:
+                await engine.notifier.close()
+                await engine.journal.close()
+
+        try:
+            rates = asyncio.run(scenario())
+        finally:
+            bot.mt5_executor.stop()
+        self.assertNotIn(int(old['time'][0]), rates['time'].tolist())
+        self.assertEqual(set(np.diff(rates['time']).tolist()), {900})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from fanout import AccountSpec, _AccountWorker
+from simulator import SimulatedMT5
+
+MAGIC = 234000
+
+
+class StrictMT5(SimulatedMT5):
+    # Like the MetaTrader5 binding, positions_get(symbol=None) is an error
+    def positions_get(self, **kwargs):
+        if 'symbol' in kwargs and kwargs['symbol'] is None:
+            raise TypeError("symbol must be a string")
+        return super().positions_get(**kwargs)
+
+
+class WorkerCloseTest(unittest.TestCase):
+    def setUp(self):
+        self.sim = StrictMT5(ticks_per_second=0, seed=4)
+        self.sim.initialize()
+        self.worker = _AccountWorker(AccountSpec(name="follower"), self.sim, conn=None)
+        for symbol in ("XAUUSD", "EURUSD"):
+            self.sim.symbol_select(symbol, True)
+            tick = self.sim.symbol_info_tick(symbol)
+            self.sim.order_send({
+                "action": self.sim.TRADE_ACTION_DEAL, "symbol": symbol, "volume": 0.01,
+                "type": self.sim.ORDER_TYPE_BUY, "price": tick.ask, "deviation": 5, "magic": MAGIC,
+            })
+
+    def test_close_without_a_symbol_closes_every_symbol(self):
+        self.assertEqual(self.worker.close(MAGIC), {'closed': 2, 'failed': 0})
+        self.assertEqual(len(self.sim.positions_get()), 0)
+
+    def test_close_with_a_symbol_leaves_the_others(self):
+        self.assertEqual(self.worker.close(MAGIC, "XAUUSD"), {'closed': 1, 'failed': 0})
+        self.assertEqual([pos.symbol for pos in self.sim.positions_get()], ["EURUSD"])
+
+    def test_failed_read_is_reported(self):
+        self.sim.positions_get = lambda **kwargs: None
+        self.assertIn('error', self.worker.close(MAGIC))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from collections import namedtuple
+
+from risk import DRAWDOWN, RiskEngine, RiskLimits
+
+Position = namedtuple('Position', 'ticket type volume price_open price_current profit')
+
+
+class RiskEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.risk = RiskEngine(RiskLimits(max_drawdown_pct=5.0))
+        # A: one buy of 1 lot, 100 per 1.0 price move; B: flat
+        self.risk.sync("A", "XAUUSD", [Position(1, 0, 1.0, 2000.0, 2000.0, 0.0)], 100.0, balance=10000.0)
+        self.risk.sync("B", "EURUSD", [], 100000.0, balance=10000.0)
+
+    def test_closing_a_winner_does_not_trip_drawdown_elsewhere(self):
+        self.assertIsNone(self.risk.on_tick("A", 2010.0, 2010.5))  # +1000 floating, peak 11000
+        self.risk.settle("A", (), {1: 2010.0})
+        self.assertEqual(self.risk.balance, 11000.0)
+        self.assertEqual(self.risk.equity, 11000.0)
+        self.assertIsNone(self.risk.on_tick("B", 1.08, 1.0801))
+
+    def test_settle_books_the_realized_pnl_in_the_phase(self):
+        self.risk.on_tick("A", 1995.0, 1995.5)
+        self.risk.settle("A", (), {1: 1996.0})
+        self.assertEqual(self.risk.phase_pnl("A"), -400.0)
+        self.assertEqual(self.risk.open_pnl("A"), 0.0)
+        self.assertEqual(self.risk.equity, 9600.0)
+
+    def test_sync_without_balance_keeps_realized_pnl_in_equity(self):
+        self.risk.on_tick("A", 2010.0, 2010.5)
+        self.risk.sync("A", "XAUUSD", [], 100.0, balance=None)
+        self.assertEqual(self.risk.equity, 11000.0)
+        self.assertNotEqual(self.risk.on_tick("B", 1.08, 1.0801), DRAWDOWN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest import run_backtest
+from signals import PHASE_STRATEGY, SignalEngine, SignalStrategy, compile_rule, series_signals
+from simulator import SimulatedMT5
+from strategy import compute_indicators
+
+
+def history(count=3000):
+    sim = SimulatedMT5(ticks_per_second=0, history=count, seed=2)
+    sim.initialize()
+    sim.symbol_select("XAUUSD", True)
+    rates = sim.copy_rates_from_pos("XAUUSD", sim.TIMEFRAME_M15, 0, count)
+    return pd.DataFrame({name: rates[name] for name in ('time', 'open', 'high', 'low', 'close', 'tick_volume', 'spread')})
+
+
+class CompileRuleTest(unittest.TestCase):
+    def evaluate(self, text, **columns):
+        rule, _ = compile_rule(text)
+        return np.asarray(rule({name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}), dtype=bool)
+
+    def test_not_is_logical_on_constants_and_arrays(self):
+        self.assertFalse(self.evaluate("not True"))
+        self.assertTrue(self.evaluate("not 0"))
+        self.assertFalse(self.evaluate("not 1"))
+        self.assertEqual(self.evaluate("not close > 1", close=[0.5, 2.0]).tolist(), [True, False])
+        self.assertEqual(self.evaluate("not (close > 1 and not close > 3)", close=[2.0, 4.0]).tolist(), [False, True])
+
+    def test_and_or_on_constants(self):
+        self.assertFalse(self.evaluate("1 and 2 and 0"))
+        self.assertTrue(self.evaluate("1 and 2"))
+        self.assertTrue(self.evaluate("0 or 2"))
+
+    def test_functions_are_only_accepted_as_calls(self):
+        self.assertEqual(self.evaluate("abs(close) > 1", close=[-2.0, 0.5]).tolist(), [True, False])
+        for text in ("close > abs", "max(close, min) > 0", "abs"):
+            with self.assertRaises(ValueError):
+                compile_rule(text)
+
+
+class SeriesSignalsTest(unittest.TestCase):
+    def setUp(self):
+        self.bars = history()
+        indicators = compute_indicators(self.bars['high'], self.bars['low'], self.bars['close'], PHASE_STRATEGY.params)
+        self.columns = {**{name: self.bars[name].to_numpy(np.float64) for name in self.bars.columns}, **indicators}
+
+    def test_history_matches_the_live_engine_bar_by_bar(self):
+        direction, strong = series_signals(PHASE_STRATEGY, self.columns)
+        engine = SignalEngine([PHASE_STRATEGY])
+        for bar in range(0, len(self.bars), 97):
+            live_direction, live_strong = engine.evaluate({name: [values[bar]] for name, values in self.columns.items()})
+            self.assertEqual((direction[bar], strong[bar]), (live_direction[0, 0], live_strong[0, 0]))
+
+    def test_backtest_trades_the_given_strategy(self):
+        never = SignalStrategy(name="never", buy="close < 0", sell="close < 0")
+        self.assertEqual(run_backtest(self.bars, strategy=never).stats['trades'], 0)
+        self.assertGreater(run_backtest(self.bars).stats['trades'], 0)
+
+    def test_missing_columns_are_reported(self):
+        volume = SignalStrategy(name="volume", buy="tick_volume > 0", sell="False")
+        with self.assertRaises(ValueError):
+            series_signals(volume, {name: values for name, values in self.columns.items() if name != 'tick_volume'})
+
+
+if __name__ == "__main__":
+    unittest.main()